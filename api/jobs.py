@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from app.config import get_setting, get_int_setting, get_float_setting
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class NonRetryableJobError(Exception):
+    # Raised by a handler when retrying can't help, e.g. the session has nothing to evaluate
+    pass
+
+
+class JobStore:
+    blocking = False  # True when calls do network I/O and must stay off the event loop
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put(self, job: dict):
+        raise NotImplementedError
+
+    def unfinished(self) -> list:
+        # Jobs to requeue after a restart
+        raise NotImplementedError
+
+    def claim(self, job_id: str, lease: float) -> bool:
+        # Exclusive right to run a job for `lease` seconds, so workers sharing a store never run it twice
+        return True
+
+    def release(self, job_id: str):
+        pass
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get, job_id)
+        return self.get(job_id)
+
+    async def aput(self, job: dict):
+        if self.blocking:
+            return await asyncio.to_thread(self.put, job)
+        return self.put(job)
+
+    async def aunfinished(self) -> list:
+        if self.blocking:
+            return await asyncio.to_thread(self.unfinished)
+        return self.unfinished()
+
+    async def aclaim(self, job_id: str, lease: float) -> bool:
+        if self.blocking:
+            return await asyncio.to_thread(self.claim, job_id, lease)
+        return self.claim(job_id, lease)
+
+    async def arelease(self, job_id: str):
+        if self.blocking:
+            return await asyncio.to_thread(self.release, job_id)
+        return self.release(job_id)
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, max_jobs: int = None):
+        self.max_jobs = max_jobs or get_int_setting("EVALUATION_JOB_MAX_JOBS", 10000)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def put(self, job: dict):
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            # Forget the oldest finished jobs beyond the limit (dicts keep insertion order)
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                if self._jobs[job_id]["status"] in (SUCCEEDED, FAILED):
+                    del self._jobs[job_id]
+
+    def unfinished(self) -> list:
+        with self._lock:
+            return [job for job in self._jobs.values() if job["status"] in (QUEUED, RUNNING)]
+
+
+class RedisJobStore(JobStore):
+    blocking = True
+
+    def __init__(self, client=None, url: str = None, ttl: int = None, prefix: str = "socratic:job:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or get_setting("REDIS_URL", "redis://localhost:6379/0"))
+        self.client = client
+        self.ttl = ttl or get_int_setting("EVALUATION_JOB_TTL", 86400)  # Seconds finished jobs are kept
+        self.prefix = prefix
+        self.unfinished_key = prefix + "unfinished"
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raw = self.client.get(self.prefix + job_id)
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, job: dict):
+        self.client.set(self.prefix + job["job_id"], json.dumps(job), ex=self.ttl)
+        if job["status"] in (QUEUED, RUNNING):
+            self.client.sadd(self.unfinished_key, job["job_id"])
+        else:
+            self.client.srem(self.unfinished_key, job["job_id"])
+
+    def unfinished(self) -> list:
+        jobs = []
+        for job_id in self.client.smembers(self.unfinished_key):
+            job = self.get(job_id.decode() if isinstance(job_id, bytes) else job_id)
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def claim(self, job_id: str, lease: float) -> bool:
+        # SET NX with an expiry: one worker wins, and a crashed worker's claim lapses after the lease
+        return bool(self.client.set(self.prefix + job_id + ":claim", "1", nx=True, ex=int(lease)))
+
+    def release(self, job_id: str):
+        self.client.delete(self.prefix + job_id + ":claim")
+
+
+def create_job_store() -> JobStore:
+    # Jobs follow the session store backend so they are shared the same way
+    if get_setting("SESSION_STORE", "memory") == "redis":
+        return RedisJobStore()
+    return InMemoryJobStore()
+
+
+class EvaluationJobQueue:
+    # Priority queue of evaluation jobs processed by a pool of asyncio workers.
+    # Lower priority numbers run first; failed attempts are requeued with exponential backoff.
+    def __init__(self, handler, store: JobStore = None, workers: int = None, max_retries: int = None, lease: float = None,
+                 claim_retry: float = None):
+        self.handler = handler  # async callable(job) -> result dict
+        self.store = store or create_job_store()
+        self.workers = workers or get_int_setting("EVALUATION_JOB_WORKERS", 4)
+        self.max_retries = max_retries or get_int_setting("EVALUATION_JOB_MAX_RETRIES", 3)
+        self.lease = lease or get_float_setting("EVALUATION_JOB_LEASE", 600.0)  # Seconds a claim lasts
+        # Seconds before a job whose claim is held elsewhere is tried again
+        self.claim_retry = claim_retry or get_float_setting("EVALUATION_JOB_CLAIM_RETRY", 30.0)
+        self._queue = None
+        self._tasks = []
+        self._timers = []
+        self._sequence = itertools.count()  # FIFO within a priority
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        # Pick up jobs left behind by a previous worker process. A job that is still claimed, by another
+        # live worker or by a dead one whose lease hasn't expired yet, is retried until it finishes
+        for job in await self.store.aunfinished():
+            self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _enqueue(self, job: dict):
+        self._queue.put_nowait((job["priority"], next(self._sequence), job["job_id"]))
+
+    def _enqueue_later(self, job: dict, delay: float):
+        loop = asyncio.get_running_loop()
+        self._timers = [timer for timer in self._timers if timer.when() > loop.time()]
+        self._timers.append(loop.call_later(delay, self._enqueue, job))
+
+    async def submit(self, session_id: str, priority: int = 10) -> dict:
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "priority": priority,
+            "status": QUEUED,
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await self.store.aput(job)
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.aget(job_id)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _update(self, job: dict, **changes):
+        job.update(changes, updated_at=datetime.utcnow().isoformat())
+        await self.store.aput(job)
+
+    async def _work(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                if not await self.store.aclaim(job_id, self.lease):
+                    # Another worker holds the claim. Keep checking until that worker finishes the job
+                    # or its lease lapses (it may have died), so the job is never dropped
+                    job = await self.store.aget(job_id)
+                    if job is not None and job["status"] not in (SUCCEEDED, FAILED):
+                        self._enqueue_later(job, self.claim_retry)
+                    continue
+                try:
+                    # Read after claiming, so a job another worker just finished is not run again
+                    job = await self.store.aget(job_id)
+                    if job is not None and job["status"] not in (SUCCEEDED, FAILED):
+                        await self._run(job)
+                finally:
+                    await self.store.arelease(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Evaluation job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: dict):
+        await self._update(job, status=RUNNING, attempts=job["attempts"] + 1)
+        try:
+            result = await self.handler(job)
+        except NonRetryableJobError as e:
+            await self._update(job, status=FAILED, error=str(e))
+            return
+        except Exception as e:
+            if job["attempts"] >= self.max_retries:
+                await self._update(job, status=FAILED, error=str(e))
+                return
+            # Requeued after the backoff instead of sleeping, so the worker is free meanwhile
+            await self._update(job, status=QUEUED, error=str(e))
+            self._enqueue_later(job, 2 ** job["attempts"])
+            return
+        await self._update(job, status=SUCCEEDED, result=result, error=None)
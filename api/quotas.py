@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from app.config import get_setting, get_int_setting, get_float_setting
+
+
+class TokenLedger:
+    # Tokens spent per user within a fixed window; limit 0 disables the cap
+    blocking = False
+
+    def __init__(self, limit: int = None, window: float = None):
+        self.limit = limit if limit is not None else get_int_setting("TOKEN_USER_LIMIT", 0)
+        self.window = window or get_float_setting("TOKEN_USER_WINDOW", 86400.0)
+
+    def used(self, user: str) -> int:
+        raise NotImplementedError
+
+    def add(self, user: str, tokens: int):
+        raise NotImplementedError
+
+    def remaining(self, user: str) -> Optional[int]:
+        if not self.limit:
+            return None
+        return max(0, self.limit - self.used(user))
+
+    async def aremaining(self, user: str) -> Optional[int]:
+        if self.blocking and self.limit:
+            return await asyncio.to_thread(self.remaining, user)
+        return self.remaining(user)
+
+    async def aadd(self, user: str, tokens: int):
+        if self.blocking:
+            return await asyncio.to_thread(self.add, user, tokens)
+        return self.add(user, tokens)
+
+
+class InMemoryTokenLedger(TokenLedger):
+    def __init__(self, limit: int = None, window: float = None):
+        super().__init__(limit, window)
+        self._users = {}  # user -> (window start, tokens used)
+        self._lock = threading.Lock()
+
+    def _entry(self, user: str, now: float):
+        # Caller holds the lock
+        entry = self._users.get(user)
+        if entry is None or now - entry[0] >= self.window:
+            entry = self._users[user] = (now, 0)
+        return entry
+
+    def used(self, user: str) -> int:
+        with self._lock:
+            return self._entry(user, time.monotonic())[1]
+
+    def add(self, user: str, tokens: int):
+        now = time.monotonic()
+        with self._lock:
+            start, used = self._entry(user, now)
+            self._users[user] = (start, used + tokens)
+            # Drop users whose window has ended so the map doesn't grow without bound
+            if len(self._users) > 10000:
+                self._users = {key: value for key, value in self._users.items() if now - value[0] < self.window}
+
+
+class RedisTokenLedger(TokenLedger):
+    blocking = True
+
+    def __init__(self, client=None, url: str = None, limit: int = None, window: float = None, prefix: str = "socratic:tokens:"):
+        super().__init__(limit, window)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or get_setting("REDIS_URL", "redis://localhost:6379/0"))
+        self.client = client
+        self.prefix = prefix
+
+    def used(self, user: str) -> int:
+        return int(self.client.get(self.prefix + user) or 0)
+
+    def add(self, user: str, tokens: int):
+        key = self.prefix + user
+        if self.client.incrby(key, tokens) == tokens:
+            self.client.expire(key, int(self.window))  # First spend in this window starts it
+
+
+def create_token_ledger() -> TokenLedger:
+    # Shared across workers whenever sessions are
+    if get_setting("SESSION_STORE", "memory") == "redis":
+        return RedisTokenLedger()
+    return InMemoryTokenLedger()
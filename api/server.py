@@ -0,0 +1,79 @@
+from contextlib import asynccontextmanager
+
+import time
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from app.llm import aclose_clients
+from app import database
+from app.metrics import registry, begin_request, end_request, span, HTTP_REQUEST_SECONDS
+from app.scheduler import llm_scheduler
+from api.routes import router, session_store, message_writer, evaluation_jobs, prewarm_predefined_use_cases, ensure_indexes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect once here rather than on import or on the first request
+    await run_in_threadpool(database.get_client)
+    await run_in_threadpool(ensure_indexes)
+    message_writer.start()
+    await evaluation_jobs.start()
+    prewarm_predefined_use_cases()
+    yield
+    await evaluation_jobs.stop()
+    # Flush buffered message records before the worker exits
+    await run_in_threadpool(message_writer.close)
+    await aclose_clients()
+    database.close_clients()
+
+
+class MetricsMiddleware:
+    # Plain ASGI so streamed responses are timed until their last chunk, not just the headers
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = begin_request()
+        try:
+            with span("http_request", histogram=None):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            end_request(token)
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route, status=status)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(router, prefix="/api")
+
+registry.gauge("socratic_sessions", "Sessions held by the in-memory session store",
+               lambda: session_store.metrics().get("sessions", 0))
+registry.gauge("socratic_persistence_queue_depth", "Message records waiting to be written",
+               lambda: message_writer.metrics()["queue_depth"])
+registry.gauge("socratic_llm_scheduler_queue_depth", "LLM calls waiting for admission",
+               lambda: llm_scheduler.metrics()["queue_depth"])
+registry.gauge("socratic_evaluation_jobs_queue_depth", "Evaluation jobs waiting for a worker", evaluation_jobs.depth)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
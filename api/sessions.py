@@ -0,0 +1,212 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.chatbot import SocraticChatManager
+from app.leetprompt import LeetPromptSocraticChatManager
+from app.catalog import LEETPROMPT_CATEGORY
+from app.config import get_setting, get_int_setting, get_float_setting
+from app.metrics import span
+
+
+class SessionStore:
+    blocking = False  # True when get/put do network I/O and must stay off the event loop
+
+    def get(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, session: dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def metrics(self) -> dict:
+        return {}
+
+    async def aget(self, session_id: str) -> Optional[dict]:
+        with span("session_lookup"):
+            if self.blocking:
+                return await asyncio.to_thread(self.get, session_id)
+            return self.get(session_id)
+
+    async def aput(self, session_id: str, session: dict):
+        if self.blocking:
+            return await asyncio.to_thread(self.put, session_id, session)
+        return self.put(session_id, session)
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = None, idle_ttl: float = None):
+        self.max_sessions = max_sessions or get_int_setting("SESSION_MAX_SESSIONS", 10000)
+        self.idle_ttl = idle_ttl or get_float_setting("SESSION_IDLE_TTL", 3600.0)  # Seconds without activity
+        self._sessions = OrderedDict()  # session_id -> (last_access, session), oldest first
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._lru_evictions = 0
+        self._ttl_evictions = 0
+
+    def _expire(self, now: float):
+        # Caller holds the lock; entries are ordered by last access, so stop at the first live one
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._ttl_evictions += 1
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id: str, session: dict):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._sessions[session_id] = (now, session)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._lru_evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "lru_evictions": self._lru_evictions,
+                "ttl_evictions": self._ttl_evictions,
+            }
+
+
+def chatbot_from_state(state: dict):
+    if state.get("category") == LEETPROMPT_CATEGORY:
+        return LeetPromptSocraticChatManager.from_state(state)
+    return SocraticChatManager.from_state(state)
+
+
+def _dump_session(session: dict) -> str:
+    state = {key: value for key, value in session.items() if key not in ("chatbot", "conversation")}
+    state["chatbot"] = session["chatbot"].to_state()
+    return json.dumps(state)
+
+
+def _load_session(raw) -> dict:
+    state = json.loads(raw)
+    chatbot = chatbot_from_state(state.pop("chatbot"))
+    state["chatbot"] = chatbot
+    state["conversation"] = chatbot.history if len(chatbot.history) > 1 else []  # Only the intro so far
+    return state
+
+
+class RedisSessionStore(SessionStore):
+    blocking = True
+
+    def __init__(self, client=None, url: str = None, idle_ttl: float = None, prefix: str = "socratic:session:"):
+        # Any client speaking the redis-py API (get/mget/set/delete/expire/rpush/lrange) works, e.g. a local stand-in
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or get_setting("REDIS_URL", "redis://localhost:6379/0"))
+        self.client = client
+        self.idle_ttl = int(idle_ttl or get_float_setting("SESSION_IDLE_TTL", 3600.0))
+        self.prefix = prefix
+        self._hits = 0
+        self._misses = 0
+
+    def _background_key(self, session_id: str, name: str) -> str:
+        return f"{self.prefix}{session_id}:{name}"
+
+    def _save_background(self, key: str, value: dict):
+        self.client.set(key, json.dumps(value), ex=self.idle_ttl)
+
+    def _save_charge(self, key: str, charge: dict):
+        # Appended, so charges from concurrent background calls never overwrite each other
+        self.client.rpush(key, json.dumps(charge))
+        self.client.expire(key, self.idle_ttl)
+
+    def _attach(self, session_id: str, chatbot):
+        # Background work (context folds, turn scores) finishes after the request has saved and dropped
+        # this object, so its results and token charges go to side keys that the next load merges back in
+        summary_key = self._background_key(session_id, "summary")
+        usage_key = self._background_key(session_id, "usage")
+        chatbot.context.on_fold = lambda state: self._save_background(summary_key, state)
+        chatbot.usage.on_background = lambda charge: self._save_charge(usage_key, charge)
+        if chatbot.turn_evaluation is not None:
+            chatbot.turn_evaluation.on_partial = lambda index, partial: self._save_background(
+                self._background_key(session_id, f"turn_evaluation:{index}"), partial
+            )
+
+    def _merge_background(self, session_id: str, chatbot):
+        # One round trip for the summary and every scored turn (one key per turn, so concurrent
+        # scores never overwrite each other)
+        turns = range(1, len(chatbot.history)) if chatbot.turn_evaluation is not None else range(0)
+        keys = [self._background_key(session_id, "summary")]
+        keys += [self._background_key(session_id, f"turn_evaluation:{index}") for index in turns]
+        raw_summary, *raw_partials = self.client.mget(keys)
+        if raw_summary is not None:
+            chatbot.context.merge_state(json.loads(raw_summary))
+        for index, raw in zip(turns, raw_partials):
+            if raw is not None:
+                chatbot.turn_evaluation.merge_partial(index, json.loads(raw))
+        # Charges carry ids, so one the saved session already counts is skipped
+        charges = self.client.lrange(self._background_key(session_id, "usage"), 0, -1)
+        chatbot.usage.merge_background([json.loads(raw) for raw in charges])
+
+    def get(self, session_id: str) -> Optional[dict]:
+        key = self.prefix + session_id
+        raw = self.client.get(key)
+        if raw is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self.client.expire(key, self.idle_ttl)  # Sliding idle timeout
+        session = _load_session(raw)
+        self._merge_background(session_id, session["chatbot"])
+        self._attach(session_id, session["chatbot"])
+        return session
+
+    def put(self, session_id: str, session: dict):
+        self.client.set(self.prefix + session_id, _dump_session(session), ex=self.idle_ttl)
+        self._attach(session_id, session["chatbot"])
+
+    def delete(self, session_id: str):
+        # Turn score keys are left to expire with the idle TTL
+        self.client.delete(self.prefix + session_id, self._background_key(session_id, "summary"),
+                           self._background_key(session_id, "usage"))
+
+    def metrics(self) -> dict:
+        # Redis expires idle sessions itself, eviction counts live in its INFO stats
+        return {
+            "backend": "redis",
+            "idle_ttl_seconds": self.idle_ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+def create_session_store() -> SessionStore:
+    backend = get_setting("SESSION_STORE", "memory")
+    if backend == "redis":
+        return RedisSessionStore()
+    return InMemorySessionStore()
@@ -0,0 +1,156 @@
+import json
+import threading
+
+import httpx
+
+from app.config import get_setting, get_int_setting, get_float_setting
+
+# HTTP client for running the Streamlit UI against the /api backend (API_BASE_URL). Deliberately
+# imports nothing that builds LLM clients or Mongo connections, so UI processes stay small.
+
+_lock = threading.Lock()
+_client = None
+
+
+class ApiError(Exception):
+    def __init__(self, detail: str, status_code: int = None):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=get_int_setting("API_CLIENT_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=get_int_setting("API_CLIENT_MAX_KEEPALIVE_CONNECTIONS", 10),
+        keepalive_expiry=get_float_setting("API_CLIENT_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    # Streams stay open for a whole reply, so the read timeout bounds the gap between tokens
+    return httpx.Timeout(
+        get_float_setting("API_CLIENT_TIMEOUT", 120.0),
+        connect=get_float_setting("API_CLIENT_CONNECT_TIMEOUT", 10.0),
+    )
+
+
+def get_http_client() -> httpx.Client:
+    # One keep-alive pool per process, shared by every Streamlit session
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(base_url=get_setting("API_BASE_URL"), limits=_pool_limits(), timeout=_timeout())
+    return _client
+
+
+def close_client():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def _check(response: httpx.Response):
+    if not response.is_error:
+        return
+    response.read()
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = response.text
+    raise ApiError(str(detail or response.reason_phrase), response.status_code)
+
+
+def _request(method: str, path: str, **kwargs):
+    try:
+        response = get_http_client().request(method, path, **kwargs)
+    except httpx.HTTPError as e:
+        raise ApiError(f"API unavailable: {e}")
+    _check(response)
+    return response.json()
+
+
+def iter_events(response: httpx.Response):
+    # Minimal Server-Sent Events parser for the API's "event:"/"data:" frames
+    event, data = "message", []
+    for line in response.iter_lines():
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].removeprefix(" "))
+        elif not line and data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+    if data:
+        yield event, json.loads("\n".join(data))
+
+
+def stream_events(path: str, payload: dict):
+    # Yields (event, data) pairs; an "error" event from the API is raised as ApiError
+    try:
+        with get_http_client().stream("POST", path, json=payload) as response:
+            _check(response)
+            for event, data in iter_events(response):
+                if event == "error":
+                    raise ApiError(data.get("detail", "API error"))
+                yield event, data
+    except httpx.HTTPError as e:
+        raise ApiError(f"API unavailable: {e}")
+
+
+def get_categories() -> dict:
+    return _request("GET", "/api/categories")
+
+
+class RemoteChatSession:
+    # Stands in for SocraticChatManager in main.py: same streaming and transcript methods,
+    # but the session, its history and its LLM calls all live in the API
+    def __init__(self, user_email: str, topic: str, category: str = None, custom: bool = False):
+        self.user_email = user_email
+        self.topic = topic
+        self.category = category
+        self.custom = custom
+        self.session_id = None
+        self.history = []
+        self.session_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    def _start_request(self):
+        if self.custom:
+            return "/api/start_custom_conversation/stream", {"custom_topic": self.topic, "user_email": self.user_email}
+        return "/api/start_predefined_conversation/stream", {
+            "category": self.category, "topic": self.topic, "user_email": self.user_email
+        }
+
+    def stream_bot_start(self):
+        if self.history:
+            return
+        for event, data in stream_events(*self._start_request()):
+            if event == "token":
+                yield data
+            elif event == "done":
+                self.session_id = data["session_id"]
+                self.history = [{"user": "", "bot": data["bot_intro"]}]
+                self.session_tokens = data.get("session_tokens", self.session_tokens)
+
+    def stream_user_reply(self, user_input: str):
+        payload = {"user_email": self.user_email, "message": user_input}
+        for event, data in stream_events(f"/api/send_message/{self.session_id}/stream", payload):
+            if event == "token":
+                yield data
+            elif event == "done":
+                self.history = data["conversation"]
+                self.session_tokens = data["session_tokens"]
+
+    def get_conversation_turns(self):
+        return self.history
+
+    @property
+    def total_tokens(self) -> int:
+        return self.session_tokens["total_tokens"]
+
+    def evaluate(self, duration: float = None) -> dict:
+        # The API evaluates and stores the result; shaped like ConversationEvaluator.evaluate_chat
+        result = _request("POST", f"/api/evaluate/{self.session_id}", json={"duration": duration})
+        return {"text": result["evaluation"], "criteria": result["criteria"], "overall_score": result["overall_score"]}
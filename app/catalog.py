@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+from app.config import get_setting, get_float_setting
+from app.prompts import get_system_prompt, get_leetprompt_system_prompt
+
+logger = logging.getLogger(__name__)
+
+LEETPROMPT_CATEGORY = "LeetPrompt"
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "catalog.json")
+
+
+@lru_cache(maxsize=256)
+def _custom_system_prompt(topic: str) -> str:
+    # Topics outside the catalog (custom topics, "Critical Thinking") are rendered once and shared
+    return get_system_prompt(topic)
+
+
+class Catalog:
+    # Immutable, indexed snapshot of catalog.json; a reload builds a new one and swaps it in
+    def __init__(self, data: dict, loaded_mtime: float = None):
+        self.loaded_mtime = loaded_mtime
+        self.categories = {category: list(topics) for category, topics in data["categories"].items()}
+        self._topics = {category: frozenset(topics) for category, topics in self.categories.items()}
+
+        # Interned, so sessions and successive reloads all point at the same string objects
+        self._system_prompts = {
+            topic: sys.intern(get_system_prompt(topic))
+            for category, topics in self.categories.items() if category != LEETPROMPT_CATEGORY
+            for topic in topics
+        }
+        self._leetprompt_problems = {}
+        for title, problem in data.get("leetprompt_problems", {}).items():
+            self._leetprompt_problems[title] = {
+                "title": title,
+                "problem": sys.intern(problem["problem"]),
+                "socratic_query": sys.intern(problem["socratic_query"]),
+                "system_prompt": sys.intern(get_leetprompt_system_prompt(title)),
+            }
+
+        missing = self._topics.get(LEETPROMPT_CATEGORY, frozenset()) - self._leetprompt_problems.keys()
+        if missing:
+            raise ValueError(f"LeetPrompt topics without a problem: {sorted(missing)}")
+
+    def has_category(self, category: str) -> bool:
+        return category in self._topics
+
+    def has_topic(self, category: str, topic: str) -> bool:
+        return topic in self._topics.get(category, ())
+
+    def topics(self, category: str) -> list:
+        return self.categories.get(category, [])
+
+    def socratic_topics(self) -> list:
+        # Every topic served by SocraticChatManager, e.g. for prewarming intro pools
+        return [topic for category, topics in self.categories.items() if category != LEETPROMPT_CATEGORY for topic in topics]
+
+    def system_prompt(self, topic: str) -> str:
+        prompt = self._system_prompts.get(topic)
+        return prompt if prompt is not None else _custom_system_prompt(topic)
+
+    def leetprompt_problem(self, title: str):
+        # Shared dict: callers must not mutate it
+        return self._leetprompt_problems.get(title)
+
+
+def load_catalog(path: str) -> Catalog:
+    mtime = os.stat(path).st_mtime
+    with open(path, encoding="utf-8") as f:
+        return Catalog(json.load(f), loaded_mtime=mtime)
+
+
+class CatalogRegistry:
+    # Serves the current Catalog and reloads it when the file changes, checking the mtime at most
+    # every CATALOG_RELOAD_INTERVAL seconds (0 disables hot reload)
+    def __init__(self, path: str = None, reload_interval: float = None):
+        self.path = path or get_setting("CATALOG_PATH", DEFAULT_CATALOG_PATH)
+        self.reload_interval = reload_interval if reload_interval is not None else get_float_setting("CATALOG_RELOAD_INTERVAL", 2.0)
+        self._catalog = None
+        self._checked = 0.0
+        self._failed_mtime = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Catalog:
+        catalog = self._catalog
+        if catalog is not None and (not self.reload_interval or time.monotonic() - self._checked < self.reload_interval):
+            return catalog
+
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = load_catalog(self.path)
+                self._checked = time.monotonic()
+            elif self.reload_interval and time.monotonic() - self._checked >= self.reload_interval:
+                self._checked = time.monotonic()
+                self._reload_if_changed()
+            return self._catalog
+
+    def _reload_if_changed(self):
+        # Caller holds the lock; a broken edit keeps the last good catalog
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            logger.warning("Topic catalog %s is missing, keeping the previous one", self.path)
+            return
+        if mtime in (self._catalog.loaded_mtime, self._failed_mtime):
+            return
+        try:
+            self._catalog = load_catalog(self.path)
+            logger.info("Reloaded topic catalog from %s", self.path)
+        except (OSError, ValueError, KeyError):
+            self._failed_mtime = mtime  # Don't retry the same broken file
+            logger.exception("Keeping the previous topic catalog; %s could not be loaded", self.path)
+
+catalog_registry = CatalogRegistry()
+
+
+def get_catalog() -> Catalog:
+    return catalog_registry.get()
@@ -1,61 +1,48 @@
 import random
-import streamlit as st
-from langchain_groq import ChatGroq
-
-def get_system_prompt(topic: str) -> str:
-    return f"""
-        You are EchoDeepak, a strict Socratic mentor focused solely on guiding students to think critically about {topic}. You never provide direct answers, definitions, or personal opinions. You exist only to challenge the student’s thinking through precise, layered questioning. You do not tolerate vague responses, topic drift, or evasive behavior.
-
-        Interaction Rules
-        - Responses must be brief (1–2 lines only), neutral, and free of emotion.
-        - Use direct, formal language. No friendly tone. No encouragement. No reassurance.
-        - Always end with one sharp, open-ended question.
-        - After every response, append exactly this message:
-        - “If you don’t understand something, state that clearly. Otherwise, stay on topic and respond with reasoning.”
-        - If the student says “I don’t understand,” respond with a minimal, factual clarification in plain language. Do not elaborate beyond the core concept.
-        - If the student gives a vague, irrelevant, or emotional response, reject it and demand a precise, topic-specific reply.
-        - If the student goes off-topic or tries to change the subject, terminate the branch with:“Irrelevant. Return to the topic: {topic}.”
-        - If the student asks for definitions, examples, or explanations, respond with a basic definition of the topic”
-
-        Core Responsibilities
-        - Expose flawed assumptions, vague language, and logical gaps.
-        - Demand specificity: “What exactly do you mean?”
-        - Require justification: “Why is that true?” or “Based on what reasoning?”
-        - Use the student’s prior responses to hold them accountable: “Earlier, you said X. Does that align with this?”
-        - Do not rephrase or simplify their work. Force them to improve it themselves.
-        - Do not acknowledge compliments, complaints, or questions about your role. Respond with: “Irrelevant. Focus on {topic}.”
-
-        Strict Guardrails
-        - No definitions. No examples. No answers.
-        - No small talk. No empathy. No deviation from Socratic questioning.
-        - No tolerance for intellectual laziness or distraction.
-        - You are not a tutor. You are a mental pressure test.
-
-
-    """
+from app.llm import get_llm, invoke, ainvoke, stream, astream
+from app.context import ConversationContext
+from app.evaluation import format_conversation, IncrementalEvaluation
+from app.config import get_bool_setting
+from app.use_cases import use_case_cache
+from app.metrics import span
+from app.tokens import TokenUsage, count_tokens, count_message_tokens
+from app.catalog import get_catalog
+from app.prompts import get_system_prompt  # Re-exported for existing callers
+
 
 class SocraticChatManager:
-    def __init__(self, topic: str, category: str = None, max_use_case_length: int = 500):
+    def __init__(self, topic: str, category: str = None, max_use_case_length: int = 500, cache_use_case: bool = True):
         self.topic = topic
         self.category = category
+        self.cache_use_case = cache_use_case  # Serve intros from the per-topic pre-generated pool
         self.max_use_case_length = max_use_case_length  # Max length of the generated use case
         self.history = []  # List of dicts: {"user": ..., "bot": ...}
-        self.llm = ChatGroq(
-            api_key=st.secrets["GROQ_API_KEY"],
-            model_name=st.secrets["MODEL_NAME"]
-        )
-        self.system_prompt = get_system_prompt(self.topic)
+        self.llm = get_llm()  # Shared, pooled client
+        self.system_prompt = get_catalog().system_prompt(self.topic)  # Shared, not rendered per session
         self.use_case = None  # Will store the hypothetical use case for Critical Thinking topics
+        self.usage = TokenUsage()  # Tokens spent by this session, and its caps
+        self.context = ConversationContext(self.llm, usage=self.usage)  # Recent turns verbatim, older ones summarized
+        # Scores each turn in the background so the final evaluation only has to aggregate
+        self.turn_evaluation = IncrementalEvaluation(self.llm, usage=self.usage) if get_bool_setting("INCREMENTAL_EVALUATION", False) else None
+
+    def _format_chat(self, user_input: str, token_budget: int = None):
+        with span("format_chat"):
+            return self.context.build(self.system_prompt, self.history, user_input, token_budget)
 
-    def _format_chat(self):
-        messages = [{"role": "system", "content": self.system_prompt}]
-        for turn in self.history:
-            messages.append({"role": "user", "content": turn["user"]})
-            messages.append({"role": "assistant", "content": turn["bot"]})
-        return messages
+    def _prepare_reply(self, user_input: str, max_tokens: int = None):
+        # Raises TokenBudgetExceeded before anything is sent if the prompt can't fit the caps
+        messages = self._format_chat(user_input)
+        return self.usage.fit(messages, lambda budget: self._format_chat(user_input, budget), max_tokens)
+
+    def _complete_turn(self, user_input: str, response: str, prompt_tokens: int):
+        self.usage.record("chat_reply", prompt_tokens, count_tokens(response), turn=len(self.history))
+        self.history.append({"user": user_input, "bot": response})
+        self.context.schedule_summary(self.history)
+        if self.turn_evaluation is not None:
+            self.turn_evaluation.schedule(self.history, len(self.history) - 1)
 
-    def generate_use_case(self) -> str:
-        prompt = f"""
+    def _use_case_prompt(self) -> str:
+        return f"""
         First, you display the definition of the {self.topic}, then write what kind of answers you expect from the user.
 
         Generate a brief hypothetical scenario (under 100 words) where critical thinking is essential in the context of "{self.topic}".
@@ -65,29 +52,155 @@ class SocraticChatManager:
         - Be concise, engaging, and easy to follow
         Format as a conversation starter. Keep word count to 100
         """
-        messages = [{"role": "system", "content": prompt}]
-        response = self.llm.invoke(messages).content.strip()
+
+    def _use_case_messages(self) -> list:
+        return [{"role": "system", "content": self._use_case_prompt()}]
+
+    def _record_use_case(self):
+        # Intros served from the pool are not charged to the session that receives them
+        self.usage.record("use_case", count_message_tokens(self._use_case_messages()), count_tokens(self.use_case), turn=0)
+
+    def generate_use_case(self, call_site: str = "use_case") -> str:
+        messages = self._use_case_messages()
+        with span("generate_use_case"):
+            response = invoke(self.llm, messages, call_site=call_site).strip()
         return response
 
+    def generate_pooled_use_case(self) -> str:
+        # Pool refills use their own call site so they are never coalesced with a student's live call,
+        # which would hand the same scenario to that student and to the next one served from the pool
+        return self.generate_use_case(call_site="use_case_refill")
+
+    async def agenerate_use_case(self) -> str:
+        messages = self._use_case_messages()
+        with span("generate_use_case"):
+            response = (await ainvoke(self.llm, messages, call_site="use_case")).strip()
+        return response
+
+    def _cached_use_case(self):
+        if not self.cache_use_case:
+            return None
+        return use_case_cache.take(self.topic, self.generate_pooled_use_case)
+
     def bot_start(self) -> str:
         if not self.history:
-            self.use_case = self.generate_use_case()
+            self.use_case = self._cached_use_case()
+            if not self.use_case:
+                self.use_case = self.generate_use_case()
+                self._record_use_case()
             bot_msg = self.use_case
             self.history.append({"user": "", "bot": bot_msg})  # store the first question
             return bot_msg
         return ""
 
-    def user_reply(self, user_input: str) -> str:
-        messages = self._format_chat()
-        messages.append({"role": "user", "content": user_input})
-        response = self.llm.invoke(messages).content.strip()
-        self.history.append({"user": user_input, "bot": response})
+    async def abot_start(self) -> str:
+        if not self.history:
+            self.use_case = self._cached_use_case()
+            if not self.use_case:
+                self.use_case = await self.agenerate_use_case()
+                self._record_use_case()
+            bot_msg = self.use_case
+            self.history.append({"user": "", "bot": bot_msg})  # store the first question
+            return bot_msg
+        return ""
+
+    def stream_bot_start(self):
+        # Yields use case tokens as they arrive; history is only updated once complete
+        if self.history:
+            return
+        cached = self._cached_use_case()
+        if cached:
+            self.use_case = cached
+            self.history.append({"user": "", "bot": cached})
+            yield cached
+            return
+        messages = self._use_case_messages()
+        chunks = []
+        for chunk in stream(self.llm, messages, call_site="use_case"):
+            chunks.append(chunk)
+            yield chunk
+        self.use_case = "".join(chunks).strip()
+        self._record_use_case()
+        self.history.append({"user": "", "bot": self.use_case})
+
+    async def astream_bot_start(self):
+        if self.history:
+            return
+        cached = self._cached_use_case()
+        if cached:
+            self.use_case = cached
+            self.history.append({"user": "", "bot": cached})
+            yield cached
+            return
+        messages = self._use_case_messages()
+        chunks = []
+        async for chunk in astream(self.llm, messages, call_site="use_case"):
+            chunks.append(chunk)
+            yield chunk
+        self.use_case = "".join(chunks).strip()
+        self._record_use_case()
+        self.history.append({"user": "", "bot": self.use_case})
+
+    def user_reply(self, user_input: str, max_tokens: int = None) -> str:
+        # max_tokens: optional extra cap for this turn, e.g. what is left of the user's allowance
+        messages, prompt_tokens = self._prepare_reply(user_input, max_tokens)
+        response = invoke(self.llm, messages, call_site="chat_reply").strip()
+        self._complete_turn(user_input, response, prompt_tokens)
+        return response
+
+    async def auser_reply(self, user_input: str, max_tokens: int = None) -> str:
+        messages, prompt_tokens = self._prepare_reply(user_input, max_tokens)
+        response = (await ainvoke(self.llm, messages, call_site="chat_reply")).strip()
+        self._complete_turn(user_input, response, prompt_tokens)
         return response
 
+    def stream_user_reply(self, user_input: str, max_tokens: int = None):
+        messages, prompt_tokens = self._prepare_reply(user_input, max_tokens)
+        chunks = []
+        for chunk in stream(self.llm, messages, call_site="chat_reply"):
+            chunks.append(chunk)
+            yield chunk
+        self._complete_turn(user_input, "".join(chunks).strip(), prompt_tokens)
+
+    async def astream_user_reply(self, user_input: str, max_tokens: int = None):
+        messages, prompt_tokens = self._prepare_reply(user_input, max_tokens)
+        chunks = []
+        async for chunk in astream(self.llm, messages, call_site="chat_reply"):
+            chunks.append(chunk)
+            yield chunk
+        self._complete_turn(user_input, "".join(chunks).strip(), prompt_tokens)
+
     def get_full_conversation(self) -> str:
-        return "\n\n".join(
-            [f"Turn {i+1}:\nYou: {turn['user']}\nEchoDeepak: {turn['bot']}" for i, turn in enumerate(self.history)]
-        )
+        return format_conversation(self.history)
 
     def get_conversation_turns(self):
         return self.history
+
+    def to_state(self) -> dict:
+        # Compact, JSON-serializable snapshot so any worker can resume the session
+        return {
+            "topic": self.topic,
+            "category": self.category,
+            "use_case": self.use_case,
+            "history": self.history,
+            **self.context.to_state(),
+            **self.usage.to_state(),
+            **(self.turn_evaluation.to_state() if self.turn_evaluation is not None else {})
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SocraticChatManager":
+        chatbot = cls(topic=state["topic"], category=state.get("category"), cache_use_case=False)
+        chatbot.use_case = state.get("use_case")
+        chatbot.history = list(state.get("history", []))
+        chatbot.context.load_state(state)
+        chatbot.usage.load_state(state)
+        if chatbot.turn_evaluation is not None:
+            chatbot.turn_evaluation.load_state(state)
+        return chatbot
+
+
+def prewarm_use_cases(topics):
+    # Fill the use case pools ahead of the first students
+    for topic in topics:
+        use_case_cache.refill(topic, SocraticChatManager(topic=topic, cache_use_case=False).generate_pooled_use_case)
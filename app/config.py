@@ -0,0 +1,40 @@
+import os
+import sys
+
+
+def get_setting(name: str, default=None, secret_path: tuple = None):
+    # Environment variables always win so the API never needs Streamlit secrets
+    value = os.environ.get(name)
+    if value is not None:
+        return value
+
+    # Only fall back to st.secrets when we are actually running under Streamlit
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            secrets = st.secrets
+            for key in (secret_path or (name,)):
+                secrets = secrets[key]
+            return secrets
+        except Exception:
+            pass
+    return default
+
+
+def get_int_setting(name: str, default: int) -> int:
+    value = get_setting(name)
+    return int(value) if value not in (None, "") else default
+
+
+def get_float_setting(name: str, default: float) -> float:
+    value = get_setting(name)
+    return float(value) if value not in (None, "") else default
+
+
+def get_bool_setting(name: str, default: bool) -> bool:
+    value = get_setting(name)
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
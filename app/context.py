@@ -0,0 +1,121 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import get_int_setting
+from app.llm import invoke
+from app.tokens import count_tokens, count_message_tokens, MESSAGE_TOKEN_OVERHEAD
+
+logger = logging.getLogger(__name__)
+
+# Background workers that fold old turns into the running summary, off the reply path
+_summary_executor = ThreadPoolExecutor(
+    max_workers=get_int_setting("SUMMARY_WORKERS", 4),
+    thread_name_prefix="context-summary"
+)
+
+
+def _summary_prompt(summary: str, turns: list) -> str:
+    transcript = "\n\n".join(f"Student: {turn['user']}\nEchoDeepak: {turn['bot']}" for turn in turns)
+    return f"""
+        You maintain a running summary of a Socratic tutoring session between EchoDeepak and a student.
+        Update the existing summary with the new turns below. Keep the student's claims, mistakes, unresolved questions
+        and the scenario being discussed, so the mentor can still hold the student accountable. Keep it under 150 words.
+
+        Existing summary:
+        {summary or "(none)"}
+
+        New turns:
+        {transcript}
+        """
+
+
+class ConversationContext:
+    def __init__(self, llm, recent_turns: int = None, token_budget: int = None, usage=None):
+        self.llm = llm
+        self.usage = usage  # Optional TokenUsage charged for summary calls
+        self.recent_turns = recent_turns or get_int_setting("CONTEXT_RECENT_TURNS", 6)  # Turns kept verbatim
+        self.token_budget = token_budget or get_int_setting("CONTEXT_TOKEN_BUDGET", 6000)  # Max prompt tokens per request
+        self.summary = ""
+        self.summarized_turns = 0  # Number of leading history turns already folded into the summary
+        self._lock = threading.Lock()
+        self._pending = None
+        # Called with to_state() after a background fold, so stores that serialize sessions can keep
+        # a result that lands after the request already saved this object
+        self.on_fold = None
+
+    def build(self, system_prompt: str, history: list, user_content: str, token_budget: int = None) -> list:
+        # token_budget can only tighten the configured budget, e.g. to fit a session's remaining allowance
+        budget = min(self.token_budget, token_budget) if token_budget else self.token_budget
+        with self._lock:
+            summary = self.summary
+            summarized_turns = self.summarized_turns
+
+        head = [{"role": "system", "content": system_prompt}]
+        if summary:
+            head.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        tail = {"role": "user", "content": user_content}
+
+        # Newest turns first until the token budget is used up; the summary may lag behind
+        # while a background fold is in flight, so unsummarized turns stay verbatim meanwhile
+        used = count_message_tokens(head) + count_tokens(user_content) + MESSAGE_TOKEN_OVERHEAD
+        kept = []
+        for turn in reversed(history[summarized_turns:]):
+            cost = count_tokens(turn["user"]) + count_tokens(turn["bot"]) + 2 * MESSAGE_TOKEN_OVERHEAD
+            if used + cost > budget:
+                break
+            kept.append(turn)
+            used += cost
+
+        messages = head
+        for turn in reversed(kept):
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["bot"]})
+        messages.append(tail)
+        return messages
+
+    def schedule_summary(self, history: list):
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return
+            fold_until = len(history) - self.recent_turns
+            if fold_until <= self.summarized_turns:
+                return
+            turns = list(history[self.summarized_turns:fold_until])
+            self._pending = _summary_executor.submit(self._fold, turns, fold_until)
+
+    def _fold(self, turns: list, fold_until: int):
+        messages = [{"role": "system", "content": _summary_prompt(self.summary, turns)}]
+        try:
+            summary = invoke(self.llm, messages, call_site="context_summary").strip()
+        except Exception:
+            return  # Keep the turns verbatim and retry on the next schedule
+        if self.usage is not None:
+            try:
+                self.usage.record_background("context_summary", count_message_tokens(messages), count_tokens(summary))
+            except Exception:
+                logger.warning("Persisting the context summary's token usage failed", exc_info=True)
+        with self._lock:
+            self.summary = summary
+            self.summarized_turns = fold_until
+        if self.on_fold is not None:
+            try:
+                self.on_fold(self.to_state())
+            except Exception:
+                logger.warning("Persisting the context summary failed", exc_info=True)
+
+    def to_state(self) -> dict:
+        with self._lock:
+            return {"summary": self.summary, "summarized_turns": self.summarized_turns}
+
+    def load_state(self, state: dict):
+        with self._lock:
+            self.summary = state.get("summary", "")
+            self.summarized_turns = state.get("summarized_turns", 0)
+
+    def merge_state(self, state: dict):
+        # Adopts a fold persisted by a background worker if it covers more turns than ours
+        with self._lock:
+            if state.get("summarized_turns", 0) > self.summarized_turns:
+                self.summary = state.get("summary", "")
+                self.summarized_turns = state["summarized_turns"]
@@ -0,0 +1,139 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+from app.config import get_setting, get_int_setting, get_float_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USERS_PATH = os.path.join(os.path.dirname(__file__), "users.json")
+HASH_ALGORITHM = "pbkdf2_sha256"
+SECRET_FIELDS = ("password", "password_hash")
+
+def hash_password(password: str, iterations: int = None) -> str:
+    iterations = iterations or get_int_setting("PASSWORD_HASH_ITERATIONS", 600000)
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return "$".join([HASH_ALGORITHM, str(iterations), base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def verify_password(password: str, record: dict) -> bool:
+    stored = record.get("password_hash")
+    if stored is None:
+        # Legacy plaintext entry, still accepted until the file is migrated (see main() below)
+        legacy = record.get("password")
+        return legacy is not None and hmac.compare_digest(legacy.encode("utf-8"), password.encode("utf-8"))
+    try:
+        algorithm, iterations, salt, digest = stored.split("$")
+    except ValueError:
+        return False
+    if algorithm != HASH_ALGORITHM:
+        return False
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), int(iterations))
+    return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+
+def _public(record: dict) -> dict:
+    # What callers get back on success: never the password or its hash
+    return {key: value for key, value in record.items() if key not in SECRET_FIELDS}
+
+
+class CredentialStore:
+    # Username-keyed index over users.json, loaded once and reloaded only when the file's mtime
+    # changes (checked at most every USERS_RELOAD_INTERVAL seconds)
+    def __init__(self, path: str = None, reload_interval: float = None):
+        self.path = path or get_setting("USERS_PATH", DEFAULT_USERS_PATH)
+        self.reload_interval = reload_interval if reload_interval is not None else get_float_setting("USERS_RELOAD_INTERVAL", 2.0)
+        self._index = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._dummy = None
+
+    def _load(self, mtime: float):
+        # Caller holds the lock
+        with open(self.path, encoding="utf-8") as f:
+            users = json.load(f)["users"]
+        index = {}
+        for record in users:
+            index.setdefault(record["username"], []).append(record)  # Duplicate usernames keep every entry
+        self._index = {username: tuple(records) for username, records in index.items()}
+        self._mtime = mtime
+
+    def _current(self) -> dict:
+        index = self._index
+        if index is not None and time.monotonic() - self._checked < self.reload_interval:
+            return index
+        with self._lock:
+            if self._index is None or time.monotonic() - self._checked >= self.reload_interval:
+                self._checked = time.monotonic()
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                    if mtime != self._mtime:
+                        self._load(mtime)
+                except (OSError, ValueError, KeyError):
+                    if self._index is None:
+                        raise
+                    logger.exception("Keeping the previous credentials; %s could not be loaded", self.path)
+            return self._index
+
+    def check_credentials(self, username: str, password: str):
+        records = self._current().get(username)
+        if not records:
+            # Unknown usernames still pay for a hash check so they take as long as known ones
+            if self._dummy is None:
+                self._dummy = {"password_hash": hash_password(secrets.token_hex(8))}
+            verify_password(password, self._dummy)
+            return None
+        for record in records:
+            if verify_password(password, record):
+                return _public(record)
+        return None
+
+    def authenticate(self, username: str, password: str):
+        # Verified inline: each Streamlit session has its own script thread and PBKDF2 releases the GIL,
+        # so concurrent logins already hash in parallel instead of queueing behind a shared pool
+        return self.check_credentials(username, password)
+
+    def metrics(self) -> dict:
+        index = self._index or {}
+        return {"users": sum(len(records) for records in index.values()), "usernames": len(index)}
+
+
+credential_store = CredentialStore()
+
+
+def migrate_users_file(path: str, iterations: int = None) -> int:
+    # Replaces plaintext passwords with salted hashes in place; returns the number converted
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    converted = 0
+    for record in data["users"]:
+        if "password" in record and "password_hash" not in record:
+            record["password_hash"] = hash_password(record.pop("password"), iterations)
+            converted += 1
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(temporary, path)  # Atomic, so a running app never reads a half-written file
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash plaintext passwords in a users.json file")
+    parser.add_argument("path", nargs="?", default=DEFAULT_USERS_PATH)
+    parser.add_argument("--iterations", type=int, default=None)
+    args = parser.parse_args()
+    print(f"Hashed {migrate_users_file(args.path, args.iterations)} passwords in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
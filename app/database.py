@@ -1,34 +1,140 @@
-import datetime
-from pymongo import MongoClient
-import streamlit as st
-
-# Access MongoDB URI from Streamlit secrets (works for both local and cloud)
-mongo_uri = st.secrets["mongodb"]["uri"]
-
-# Connect to MongoDB
-client = MongoClient(mongo_uri)
-
-# Access the database and collection
-db = client["chatbot_database"]  # Replace with your database name
-conversations_collection = db["conversations"]  # Collection to store conversations
-
-def save_conversation(user_id, selected_topic, selected_category, evaluation_result, duration):
-    # Prepare the conversation data
-    conversation_data = {
-        "turns": st.session_state.chatbot.get_conversation_turns(),  # Store the conversation turns
-        "topic": selected_topic,  # Store the selected topic
-        "category": selected_category,  # Store the selected category
-        "evaluation": evaluation_result,  # Store the evaluation result
-    }
+import argparse
+import itertools
+import threading
+from pymongo import MongoClient, UpdateOne, ASCENDING
+
+from app.config import get_setting, get_int_setting
+from app.metrics import span
+from app.persistence import evaluation_update, legacy_session_update
+
+# One lazily created, pooled client per process, shared by Streamlit and the API
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_session_index_ready = False
+
 
-    # Prepare the document to insert into MongoDB
-    conversation_doc = {
-        "user_id": user_id,  # Store user ID
-        "conversation_data": conversation_data,  # Store conversation data
-        "timestamp": datetime.datetime.utcnow(),  # Store the timestamp in UTC
-        "duration(seconds)": duration  # Store the duration of the conversation
+def _client_options() -> dict:
+    return {
+        "maxPoolSize": get_int_setting("MONGODB_MAX_POOL_SIZE", 100),
+        "minPoolSize": get_int_setting("MONGODB_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": get_int_setting("MONGODB_MAX_IDLE_TIME_MS", 300000),
+        "connectTimeoutMS": get_int_setting("MONGODB_CONNECT_TIMEOUT_MS", 10000),
+        "serverSelectionTimeoutMS": get_int_setting("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 10000),
     }
 
-    # Insert the conversation into MongoDB
-    conversations_collection.insert_one(conversation_doc)
 
+def get_mongo_uri() -> str:
+    # MONGODB_URI env var, or [mongodb] uri in Streamlit secrets (works for both local and cloud)
+    return get_setting("MONGODB_URI", secret_path=("mongodb", "uri"))
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(get_mongo_uri(), **_client_options())
+    return _client
+
+
+def get_async_client():
+    # Optional Motor client for fully async callers; requires the motor package
+    global _async_client
+    if _async_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(get_mongo_uri(), **_client_options())
+    return _async_client
+
+
+def close_clients():
+    global _client, _async_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        if _async_client is not None:
+            _async_client.close()
+        _client = None
+        _async_client = None
+
+
+def get_conversations_collection():
+    # Conversations saved by the Streamlit app
+    return get_client()[get_setting("MONGODB_DATABASE", "chatbot_database")]["conversations"]
+
+
+def get_api_collection():
+    # Per-message records the API wrote before session documents; only read by migrate_api_collection
+    return get_client()[get_setting("API_MONGODB_DATABASE", "chat-database")]["api"]
+
+
+def get_sessions_collection():
+    # One document per API session, upserted by session_id
+    return get_client()[get_setting("API_MONGODB_DATABASE", "chat-database")]["sessions"]
+
+
+def get_evaluations_collection():
+    # Structured evaluation results keyed by conversation hash
+    return get_client()[get_setting("API_MONGODB_DATABASE", "chat-database")]["evaluations"]
+
+
+def _ensure_session_index(collection):
+    # Unique, so every update of a session upserts the same document; sparse for older documents
+    global _session_index_ready
+    if not _session_index_ready:
+        collection.create_index([("session_id", ASCENDING)], unique=True, sparse=True)
+        _session_index_ready = True
+
+
+def save_session_update(session_id: str, update: dict):
+    # Streamlit writes its session documents inline; the API batches the same updates through MessageWriter
+    collection = get_conversations_collection()
+    _ensure_session_index(collection)
+    with span("mongo_update_one"):
+        collection.update_one({"session_id": session_id}, update, upsert=True)
+
+
+def migrate_api_collection(batch_size: int = 500) -> int:
+    # Folds the legacy `api` records into session documents; safe to rerun. Returns the sessions written
+    records = get_api_collection().find({"session_id": {"$exists": True}}, allow_disk_use=True).sort(
+        [("session_id", ASCENDING), ("_id", ASCENDING)]
+    )
+    sessions = get_sessions_collection()
+    migrated, batch = 0, []
+    for session_id, group in itertools.groupby(records, key=lambda record: record["session_id"]):
+        batch.append(UpdateOne({"session_id": session_id}, legacy_session_update(list(group)), upsert=True))
+        if len(batch) >= batch_size:
+            sessions.bulk_write(batch, ordered=False)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        sessions.bulk_write(batch, ordered=False)
+        migrated += len(batch)
+    return migrated
+
+
+def save_conversation(user_id, selected_topic, selected_category, evaluation_result, duration, session_id):
+    import streamlit as st
+
+    # Turns were already appended one by one; this sets the evaluation on the same document
+    save_session_update(session_id, evaluation_update(
+        evaluation_result,
+        duration=duration,
+        token_usage=st.session_state.chatbot.usage.summary(),  # Tokens spent, per turn and per call site
+        user_id=user_id,
+        topic=selected_topic,
+        category=selected_category
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold the API's legacy per-message records into session documents")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    print(f"Migrated {migrate_api_collection(args.batch_size)} sessions")
+
+
+if __name__ == "__main__":
+    main()
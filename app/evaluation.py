@@ -1,15 +1,219 @@
-import streamlit as st
-from langchain_groq import ChatGroq
+import asyncio
+import datetime
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.llm import get_llm, invoke, ainvoke
+from app.config import get_int_setting, get_bool_setting
+from app.database import get_evaluations_collection
+from app.metrics import span
+from app.tokens import count_tokens, count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the evaluation prompt changes so cached results are not reused
+EVALUATION_PROMPT_VERSION = "1"
+
+CRITERIA = ["Clarity", "Depth", "Application", "Critical Thinking", "Progression", "Relevance", "Creativity"]
+
+_criterion_pattern = re.compile(
+    r"^[\s*#-]*(?:\d+[.)]\s*)?[\s*]*(" + "|".join(re.escape(name) for name in CRITERIA) + r")\s*\**\s*:\s*\**\s*\[?(\d+(?:\.\d+)?)\]?\s*/\s*5\s*\**\s*[-–—:]?\s*",
+    re.MULTILINE | re.IGNORECASE
+)
+
+
+def parse_evaluation(text: str) -> dict:
+    # Splits the "Criterion: [score]/5 - feedback" response into per-criterion scores and feedback
+    matches = list(_criterion_pattern.finditer(text))
+    canonical = {name.lower(): name for name in CRITERIA}
+    criteria = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        criteria[canonical[match.group(1).lower()]] = {
+            "score": float(match.group(2)),
+            "feedback": text[match.end():end].strip()
+        }
+    scores = [criterion["score"] for criterion in criteria.values()]
+    return {
+        "criteria": criteria,
+        "overall_score": round(sum(scores) / len(scores), 2) if scores else None,
+        "text": text,
+        "prompt_version": EVALUATION_PROMPT_VERSION
+    }
+
+
+def _normalize(conversation: str) -> str:
+    return "\n".join(" ".join(line.split()) for line in conversation.strip().splitlines() if line.strip())
+
+
+class EvaluationCache:
+    # In-memory LRU in front of a Mongo collection keyed by the conversation hash
+    def __init__(self, max_entries: int = None, persist: bool = None):
+        self.max_entries = max_entries or get_int_setting("EVALUATION_CACHE_SIZE", 1000)
+        self.persist = get_bool_setting("EVALUATION_CACHE_PERSIST", True) if persist is None else persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, result: dict):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        if not self.persist:
+            return None
+        try:
+            doc = get_evaluations_collection().find_one({"_id": key})
+        except Exception:
+            logger.warning("Evaluation cache lookup failed", exc_info=True)
+            return None
+        if doc is None or not doc["result"].get("criteria"):
+            return None  # Unparsed results stored by older versions are evaluated again
+        self._remember(key, doc["result"])
+        return doc["result"]
+
+    def put(self, key: str, result: dict):
+        if not result.get("criteria"):
+            return  # Couldn't be parsed; caching it would make the failure permanent for this conversation
+        self._remember(key, result)
+        if not self.persist:
+            return
+        try:
+            get_evaluations_collection().replace_one(
+                {"_id": key},
+                {"_id": key, "result": result, "created_at": datetime.datetime.utcnow()},
+                upsert=True
+            )
+        except Exception:
+            logger.warning("Evaluation cache write failed", exc_info=True)
+
+
+evaluation_cache = EvaluationCache()
+
+
+# Background workers that score turns while the student is thinking
+_turn_executor = ThreadPoolExecutor(
+    max_workers=get_int_setting("TURN_EVALUATION_WORKERS", 4),
+    thread_name_prefix="turn-evaluation"
+)
+
+
+def _turn_prompt(question: str, answer: str) -> str:
+    return f"""
+        You are an expert Socratic evaluator. Score the student's single reply below on each criterion from 1 to 5,
+        with one short sentence of evidence per criterion. Judge only this reply in the context of the question.
+
+        Mentor question:
+        {question}
+
+        Student reply:
+        {answer}
+
+        Respond in exactly this format:
+        """ + "\n".join(f"        {name}: [score]/5 - [one sentence]" for name in CRITERIA)
+
+
+def _charge(usage, call_site: str, prompt: str, response: str):
+    if usage is not None:
+        usage.record(call_site, count_message_tokens(prompt), count_tokens(response))
+
+
+def _charge_background(usage, call_site: str, prompt: str, response: str):
+    if usage is not None:
+        try:
+            usage.record_background(call_site, count_message_tokens(prompt), count_tokens(response))
+        except Exception:
+            logger.warning("Persisting a background call's token usage failed", exc_info=True)
+
+
+class IncrementalEvaluation:
+    # Per-session partial scores, computed in the background as each turn completes
+    def __init__(self, llm, usage=None):
+        self.llm = llm
+        self.usage = usage  # Optional TokenUsage charged for scoring calls
+        self.partials = {}  # turn index -> parsed partial evaluation
+        self._futures = {}
+        self._lock = threading.Lock()
+        # Called with (index, partial) when a background score lands, so stores that serialize sessions
+        # can keep a result that arrives after the request already saved this object
+        self.on_partial = None
+
+    def schedule(self, history: list, index: int):
+        if index < 1 or not history[index]["user"]:
+            return  # Nothing to score on the intro turn
+        question, answer = history[index - 1]["bot"], history[index]["user"]
+        with self._lock:
+            self._futures[index] = _turn_executor.submit(self._score, index, question, answer)
+
+    def _score(self, index: int, question: str, answer: str) -> dict:
+        prompt = _turn_prompt(question, answer)
+        response = invoke(self.llm, prompt, call_site="turn_evaluation")
+        _charge_background(self.usage, "turn_evaluation", prompt, response)
+        partial = parse_evaluation(response)
+        with self._lock:
+            self.partials[index] = partial
+        if self.on_partial is not None:
+            try:
+                self.on_partial(index, partial)
+            except Exception:
+                logger.warning("Persisting a turn evaluation failed", exc_info=True)
+        return partial
+
+    def collect(self, history: list) -> list:
+        # Waits for in-flight scores and scores any turn that was missed (e.g. after a restart) inline
+        partials = []
+        for index in range(1, len(history)):
+            if not history[index]["user"]:
+                continue
+            with self._lock:
+                partial = self.partials.get(index)
+                future = self._futures.get(index)
+            if partial is None and future is not None:
+                try:
+                    partial = future.result()
+                except Exception:
+                    logger.warning("Background turn evaluation failed", exc_info=True)
+            if partial is None:
+                partial = self._score(index, history[index - 1]["bot"], history[index]["user"])
+            partials.append(partial)
+        return partials
+
+    def to_state(self) -> dict:
+        with self._lock:
+            return {"turn_evaluations": {str(index): partial for index, partial in self.partials.items()}}
+
+    def load_state(self, state: dict):
+        with self._lock:
+            self.partials = {int(index): partial for index, partial in state.get("turn_evaluations", {}).items()}
+
+    def merge_partial(self, index: int, partial: dict):
+        # Adopts a score persisted by a background worker for a turn we have no score for
+        with self._lock:
+            self.partials.setdefault(index, partial)
+
+
+def format_conversation(turns) -> str:
+    return "\n\n".join(
+        [f"Turn {i+1}:\nYou: {turn['user']}\nEchoDeepak: {turn['bot']}" for i, turn in enumerate(turns)]
+    )
 
 class ConversationEvaluator:
     def __init__(self):
-        self.llm = ChatGroq(
-            api_key=st.secrets["GROQ_API_KEY"],
-            model_name=st.secrets["MODEL_NAME"]
-            )
+        self.llm = get_llm()  # Shared, pooled client
 
-    def evaluate(self, conversation: str) -> str:
-        prompt = f"""
+    def _evaluation_prompt(self, conversation: str) -> str:
+        return f"""
             You are an expert Socratic evaluator for Generative AI education.
 
             Evaluate the following conversation between a Socratic mentor (EchoDeepak) and a student. For each evaluation criterion, give a score from 1 to 5. Then provide detailed, constructive feedback that includes:
@@ -44,4 +248,96 @@ class ConversationEvaluator:
             Relevance: [score]/5 - [detailed feedback with examples, issues, and improvement suggestions]  
             Creativity: [score]/5 - [detailed feedback with examples, issues, and improvement suggestions] 
             """
-        return self.llm.invoke(prompt).content
+
+    def _synthesis_prompt(self, partials: list) -> str:
+        averages = {}
+        for name in CRITERIA:
+            scores = [partial["criteria"][name]["score"] for partial in partials if name in partial["criteria"]]
+            averages[name] = round(sum(scores) / len(scores), 1) if scores else None
+        notes = "\n\n".join(
+            f"Turn {i + 1}:\n" + "\n".join(
+                f"{name}: {criterion['score']:g}/5 - {criterion['feedback']}" for name, criterion in partial["criteria"].items()
+            )
+            for i, partial in enumerate(partials)
+        )
+        return f"""
+            You are an expert Socratic evaluator for Generative AI education.
+
+            Below are per-turn scores and notes for a student's replies in a Socratic conversation, plus the average score per criterion.
+            Write the final evaluation. Use the average scores (rounded to the nearest whole number), and for each criterion give concise,
+            constructive feedback: what was lacking, why it matters, and how to improve. Note progression across turns.
+
+            Average scores:
+            {", ".join(f"{name}: {score}" for name, score in averages.items())}
+
+            Per-turn notes:
+            {notes}
+
+            Respond in the following format:
+
+            """ + "\n".join(f"            {name}: [score]/5 - [feedback]" for name in CRITERIA)
+
+    def cache_key(self, conversation: str, mode: str = "full") -> str:
+        model_name = getattr(self.llm, "model_name", "")
+        payload = f"{EVALUATION_PROMPT_VERSION}\n{mode}\n{model_name}\n{_normalize(conversation)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def evaluate(self, conversation: str, usage=None) -> dict:
+        # usage: optional TokenUsage of the session being evaluated, charged only on a cache miss
+        with span("evaluate"):
+            key = self.cache_key(conversation)
+            result = evaluation_cache.get(key)
+            if result is None:
+                prompt = self._evaluation_prompt(conversation)
+                response = invoke(self.llm, prompt, call_site="evaluation")
+                _charge(usage, "evaluation", prompt, response)
+                result = parse_evaluation(response)
+                evaluation_cache.put(key, result)
+            return result
+
+    async def aevaluate(self, conversation: str, usage=None) -> dict:
+        with span("evaluate"):
+            key = self.cache_key(conversation)
+            result = await asyncio.to_thread(evaluation_cache.get, key)
+            if result is None:
+                prompt = self._evaluation_prompt(conversation)
+                response = await ainvoke(self.llm, prompt, call_site="evaluation")
+                _charge(usage, "evaluation", prompt, response)
+                result = parse_evaluation(response)
+                await asyncio.to_thread(evaluation_cache.put, key, result)
+            return result
+
+    def evaluate_chat(self, chatbot) -> dict:
+        # Aggregates background per-turn scores when the chat was run in incremental mode
+        if chatbot.turn_evaluation is None:
+            return self.evaluate(chatbot.get_full_conversation(), chatbot.usage)
+        key = self.cache_key(chatbot.get_full_conversation(), mode="incremental")
+        result = evaluation_cache.get(key)
+        if result is None:
+            partials = chatbot.turn_evaluation.collect(chatbot.history)
+            if not partials:
+                return self.evaluate(chatbot.get_full_conversation(), chatbot.usage)
+            prompt = self._synthesis_prompt(partials)
+            with span("evaluate_synthesis"):
+                response = invoke(self.llm, prompt, call_site="evaluation_synthesis")
+            _charge(chatbot.usage, "evaluation_synthesis", prompt, response)
+            result = parse_evaluation(response)
+            evaluation_cache.put(key, result)
+        return result
+
+    async def aevaluate_chat(self, chatbot) -> dict:
+        if chatbot.turn_evaluation is None:
+            return await self.aevaluate(chatbot.get_full_conversation(), chatbot.usage)
+        key = self.cache_key(chatbot.get_full_conversation(), mode="incremental")
+        result = await asyncio.to_thread(evaluation_cache.get, key)
+        if result is None:
+            partials = await asyncio.to_thread(chatbot.turn_evaluation.collect, chatbot.history)
+            if not partials:
+                return await self.aevaluate(chatbot.get_full_conversation(), chatbot.usage)
+            prompt = self._synthesis_prompt(partials)
+            with span("evaluate_synthesis"):
+                response = await ainvoke(self.llm, prompt, call_site="evaluation_synthesis")
+            _charge(chatbot.usage, "evaluation_synthesis", prompt, response)
+            result = parse_evaluation(response)
+            await asyncio.to_thread(evaluation_cache.put, key, result)
+        return result
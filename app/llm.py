@@ -0,0 +1,263 @@
+import asyncio
+import threading
+import time
+import httpx
+from langchain_groq import ChatGroq
+
+from app.config import get_setting, get_int_setting, get_float_setting
+from app.llm_cache import response_cache, request_key
+from app.singleflight import single_flight
+from app.scheduler import llm_scheduler, is_retryable, is_rate_limited, backoff_delay, INTERACTIVE, START, EVALUATE, BACKGROUND
+from app.tokens import count_message_tokens
+from app.metrics import span, LLM_QUEUE_SECONDS, LLM_REQUEST_SECONDS, LLM_REQUESTS
+
+# Scheduler priority per call site; interactive turns always go first
+CALL_SITE_PRIORITIES = {
+    "chat_reply": INTERACTIVE,
+    "leetprompt_reply": INTERACTIVE,
+    "leetprompt_first_reply": INTERACTIVE,
+    "use_case": START,
+    "use_case_refill": BACKGROUND,
+    "evaluation": EVALUATE,
+    "evaluation_synthesis": EVALUATE,
+    "turn_evaluation": BACKGROUND,
+    "context_summary": BACKGROUND,
+}
+
+# Process-wide registry: one ChatGroq per (model, temperature), all sharing
+# the same keep-alive connection pools
+_lock = threading.Lock()
+_clients = {}
+_http_client = None
+_http_async_client = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=get_int_setting("LLM_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=get_int_setting("LLM_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=get_float_setting("LLM_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        get_float_setting("LLM_TIMEOUT", 60.0),
+        connect=get_float_setting("LLM_CONNECT_TIMEOUT", 10.0),
+    )
+
+
+def get_http_clients():
+    global _http_client, _http_async_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_async_client = httpx.AsyncClient(limits=_pool_limits(), timeout=_timeout())
+                _http_client = httpx.Client(limits=_pool_limits(), timeout=_timeout())
+    return _http_client, _http_async_client
+
+
+def get_llm(model_name: str = None, temperature: float = None) -> ChatGroq:
+    model_name = model_name or get_setting("MODEL_NAME")
+    key = (model_name, temperature)
+    llm = _clients.get(key)
+    if llm is not None:
+        return llm
+
+    http_client, http_async_client = get_http_clients()
+    with _lock:
+        llm = _clients.get(key)
+        if llm is None:
+            kwargs = {
+                "api_key": get_setting("GROQ_API_KEY"),
+                "model_name": model_name,
+                "http_client": http_client,
+                "http_async_client": http_async_client,
+                "max_retries": 0,  # Retries are owned by the scheduler-aware helpers below
+            }
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            base_url = get_setting("GROQ_BASE_URL")  # e.g. a local OpenAI/Groq-compatible stub
+            if base_url:
+                kwargs["base_url"] = base_url
+            llm = ChatGroq(**kwargs)
+            _clients[key] = llm
+    return llm
+
+
+def _admission(messages, call_site: str):
+    priority = CALL_SITE_PRIORITIES.get(call_site, EVALUATE)
+    tokens = count_message_tokens(messages) + get_int_setting("LLM_COMPLETION_TOKEN_ESTIMATE", 256)
+    return priority, tokens
+
+
+def _max_retries() -> int:
+    return get_int_setting("LLM_MAX_RETRIES", 4)
+
+
+def _scheduled_invoke(llm, messages, call_site: str) -> str:
+    priority, tokens = _admission(messages, call_site)
+    for attempt in range(_max_retries() + 1):
+        with span("llm_queue_wait", LLM_QUEUE_SECONDS, call_site=call_site):
+            llm_scheduler.acquire(priority, tokens)
+        try:
+            with span("llm_request", LLM_REQUEST_SECONDS, call_site=call_site):
+                content = llm.invoke(messages).content
+            LLM_REQUESTS.inc(call_site=call_site, outcome="ok")
+            return content
+        except Exception as e:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="error")
+            if attempt == _max_retries() or not is_retryable(e):
+                raise
+            llm_scheduler.record_retry(rate_limited=is_rate_limited(e))
+            time.sleep(backoff_delay(attempt, e))
+
+
+async def _scheduled_ainvoke(llm, messages, call_site: str) -> str:
+    priority, tokens = _admission(messages, call_site)
+    for attempt in range(_max_retries() + 1):
+        with span("llm_queue_wait", LLM_QUEUE_SECONDS, call_site=call_site):
+            await llm_scheduler.aacquire(priority, tokens)
+        try:
+            with span("llm_request", LLM_REQUEST_SECONDS, call_site=call_site):
+                content = (await llm.ainvoke(messages)).content
+            LLM_REQUESTS.inc(call_site=call_site, outcome="ok")
+            return content
+        except Exception as e:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="error")
+            if attempt == _max_retries() or not is_retryable(e):
+                raise
+            llm_scheduler.record_retry(rate_limited=is_rate_limited(e))
+            await asyncio.sleep(backoff_delay(attempt, e))
+
+
+def invoke(llm, messages, call_site: str = None) -> str:
+    # Single entry point for completions; call_site selects priority and per-path behaviour such as caching
+    cache_key = response_cache.key(llm, messages) if response_cache.enabled_for(call_site, llm) else None
+    if cache_key:
+        content = response_cache.get(cache_key)
+        if content is not None:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="cache_hit")
+            return content
+
+    if single_flight.enabled_for(call_site):
+        content = single_flight.do(request_key(llm, messages), call_site, lambda: _scheduled_invoke(llm, messages, call_site))
+    else:
+        content = _scheduled_invoke(llm, messages, call_site)
+    if cache_key:
+        response_cache.put(cache_key, content)
+    return content
+
+
+async def ainvoke(llm, messages, call_site: str = None) -> str:
+    cache_key = response_cache.key(llm, messages) if response_cache.enabled_for(call_site, llm) else None
+    if cache_key:
+        content = await asyncio.to_thread(response_cache.get, cache_key)
+        if content is not None:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="cache_hit")
+            return content
+
+    if single_flight.enabled_for(call_site):
+        content = await single_flight.ado(request_key(llm, messages), call_site, lambda: _scheduled_ainvoke(llm, messages, call_site))
+    else:
+        content = await _scheduled_ainvoke(llm, messages, call_site)
+    if cache_key:
+        await asyncio.to_thread(response_cache.put, cache_key, content)
+    return content
+
+
+def stream(llm, messages, call_site: str = None):
+    # Yields content chunks; a cached reply is sent as one chunk, a fresh one is cached once complete
+    cache_key = response_cache.key(llm, messages) if response_cache.enabled_for(call_site, llm) else None
+    if cache_key:
+        content = response_cache.get(cache_key)
+        if content is not None:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="cache_hit")
+            yield content
+            return
+    chunks = []
+    for chunk in _scheduled_stream(llm, messages, call_site):
+        chunks.append(chunk)
+        yield chunk
+    if cache_key:
+        response_cache.put(cache_key, "".join(chunks))
+
+
+async def astream(llm, messages, call_site: str = None):
+    cache_key = response_cache.key(llm, messages) if response_cache.enabled_for(call_site, llm) else None
+    if cache_key:
+        content = await asyncio.to_thread(response_cache.get, cache_key)
+        if content is not None:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="cache_hit")
+            yield content
+            return
+    chunks = []
+    async for chunk in _scheduled_astream(llm, messages, call_site):
+        chunks.append(chunk)
+        yield chunk
+    if cache_key:
+        await asyncio.to_thread(response_cache.put, cache_key, "".join(chunks))
+
+
+def _scheduled_stream(llm, messages, call_site: str = None):
+    # Failures are only retried before the first chunk has been sent
+    priority, tokens = _admission(messages, call_site)
+    for attempt in range(_max_retries() + 1):
+        with span("llm_queue_wait", LLM_QUEUE_SECONDS, call_site=call_site):
+            llm_scheduler.acquire(priority, tokens)
+        started = False
+        began = time.perf_counter()  # Timed by hand: a span can't stay current across yields
+        try:
+            for chunk in llm.stream(messages):
+                started = True
+                yield chunk.content
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - began, call_site=call_site)
+            LLM_REQUESTS.inc(call_site=call_site, outcome="ok")
+            return
+        except Exception as e:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="error")
+            if started or attempt == _max_retries() or not is_retryable(e):
+                raise
+            llm_scheduler.record_retry(rate_limited=is_rate_limited(e))
+            time.sleep(backoff_delay(attempt, e))
+
+
+async def _scheduled_astream(llm, messages, call_site: str = None):
+    priority, tokens = _admission(messages, call_site)
+    for attempt in range(_max_retries() + 1):
+        with span("llm_queue_wait", LLM_QUEUE_SECONDS, call_site=call_site):
+            await llm_scheduler.aacquire(priority, tokens)
+        started = False
+        began = time.perf_counter()
+        try:
+            async for chunk in llm.astream(messages):
+                started = True
+                yield chunk.content
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - began, call_site=call_site)
+            LLM_REQUESTS.inc(call_site=call_site, outcome="ok")
+            return
+        except Exception as e:
+            LLM_REQUESTS.inc(call_site=call_site, outcome="error")
+            if started or attempt == _max_retries() or not is_retryable(e):
+                raise
+            llm_scheduler.record_retry(rate_limited=is_rate_limited(e))
+            await asyncio.sleep(backoff_delay(attempt, e))
+
+
+def close_clients():
+    global _http_client
+    with _lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        # The async pool is left for the event loop that owns it (see aclose_clients)
+
+
+async def aclose_clients():
+    global _http_async_client
+    async_client = _http_async_client
+    close_clients()
+    if async_client is not None:
+        await async_client.aclose()
+    _http_async_client = None
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import get_setting, get_int_setting, get_float_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_messages(messages) -> list:
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return [[message["role"], " ".join(message["content"].split())] for message in messages]
+
+
+def request_key(llm, messages) -> str:
+    # Identifies a request by model, temperature and normalized messages
+    payload = json.dumps([
+        getattr(llm, "model_name", ""),
+        getattr(llm, "temperature", None),
+        _normalize_messages(messages)
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # Exact-match completion cache: in-memory LRU in front of an on-disk SQLite tier.
+    # Opt-in: only call sites listed in LLM_CACHE_SITES use it (none by default), and only when the
+    # call's client runs at temperature 0, since a sampled reply must not be replayed.
+    def __init__(self, sites: str = None, max_entries: int = None, path: str = None, ttl_seconds: float = None):
+        sites = get_setting("LLM_CACHE_SITES", "") if sites is None else sites
+        self.sites = {site.strip() for site in sites.split(",") if site.strip()}
+        self.max_entries = max_entries or get_int_setting("LLM_CACHE_SIZE", 2048)
+        self.path = get_setting("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3") if path is None else path
+        self.ttl_seconds = ttl_seconds or get_float_setting("LLM_CACHE_TTL", 7 * 24 * 3600.0)
+        self._refused = set()  # Listed sites seen with a sampling client, warned about once
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_unavailable = False
+        self._disk_errors = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def enabled_for(self, call_site: str, llm) -> bool:
+        if call_site not in self.sites:
+            return False
+        # langchain-groq raises a temperature of 0 to 1e-8, so anything that small counts as greedy
+        temperature = getattr(llm, "temperature", None)
+        if temperature is not None and temperature < 1e-6:
+            return True
+        if call_site not in self._refused:
+            self._refused.add(call_site)
+            logger.warning("LLM response cache skipped for %s: its client samples at temperature %s", call_site, temperature)
+        return False
+
+    def key(self, llm, messages) -> str:
+        return request_key(llm, messages)
+
+    def _disk(self):
+        # Caller holds the lock; an empty path disables the disk tier, and so does a path that can't be
+        # opened (the memory tier keeps working)
+        if self._db is None and self.path and not self._disk_unavailable:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT, created REAL)")
+                self._db = db
+            except (OSError, sqlite3.Error):
+                self._disk_unavailable = True
+                self._disk_errors += 1
+                logger.warning("LLM response cache disk tier disabled; %s could not be opened", self.path, exc_info=True)
+        return self._db
+
+    def _remember(self, key: str, content: str):
+        # Caller holds the lock
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return content
+
+            row = None
+            db = self._disk()
+            if db:
+                try:
+                    row = db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    # e.g. "database is locked" with several workers: treat as a miss
+                    self._disk_errors += 1
+                    logger.warning("LLM response cache lookup failed", exc_info=True)
+            if row is None or time.time() - row[1] > self.ttl_seconds:
+                self._misses += 1
+                return None
+            self._remember(key, row[0])
+            self._disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            self._remember(key, content)
+            db = self._disk()
+            if db:
+                try:
+                    db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, content, time.time()))
+                    db.commit()
+                except sqlite3.Error:
+                    self._disk_errors += 1
+                    logger.warning("LLM response cache write failed", exc_info=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "sites": sorted(self.sites),
+                "entries": len(self._entries),
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "disk_errors": self._disk_errors,
+            }
+
+
+response_cache = ResponseCache()
@@ -1,19 +1,10 @@
 import streamlit as st
-import json
 
-def load_user_data():
-    # Load the user data from a JSON file
-    with open("app/users.json") as f:
-        return json.load(f)
+from app.credentials import credential_store
 
 def check_credentials(username, password):
-    users = load_user_data()
-    for user in users["users"]:
-        if user["username"] == username:
-            # Here we are comparing plain text password, but you should hash the passwords in a real app
-            if user["password"] == password:
-                return user
-    return None
+    # Served from the cached, hashed credential index; the hash check runs off the script thread
+    return credential_store.authenticate(username, password)
 
 def login():
     st.title("Login to EchoDeepak")
@@ -23,7 +14,8 @@ def login():
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        user = check_credentials(username, password)
+        with st.spinner("Checking credentials..."):
+            user = check_credentials(username, password)
         if user:
             st.session_state.user = user
             st.session_state.logged_in = True
@@ -0,0 +1,204 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import get_bool_setting, get_setting
+
+logger = logging.getLogger(__name__)
+
+# Prometheus-format instrumentation with no extra dependency; spans are exported through
+# OpenTelemetry when TRACING_ENABLED is set and the opentelemetry packages are installed
+
+INF_BOUND = 'le="+Inf"'
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, INF_BOUND)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Gauge:
+    # Sampled at scrape time from a callback, so existing metrics() dicts can be exported as-is
+    def __init__(self, name: str, help: str, collect):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> list:
+        try:
+            value = self.collect()
+        except Exception:
+            logger.exception("Gauge %s failed to collect", self.name)
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, collect) -> Gauge:
+        return self._register(Gauge(name, help, collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+OPERATION_SECONDS = registry.histogram(
+    "socratic_operation_seconds", "Duration of instrumented hot-path operations", ("operation",))
+OPERATION_ERRORS = registry.counter(
+    "socratic_operation_errors_total", "Instrumented operations that raised", ("operation",))
+LLM_QUEUE_SECONDS = registry.histogram(
+    "socratic_llm_queue_wait_seconds", "Time LLM calls waited for scheduler admission", ("call_site",))
+LLM_REQUEST_SECONDS = registry.histogram(
+    "socratic_llm_request_seconds", "LLM call duration, excluding queueing", ("call_site",))
+LLM_REQUESTS = registry.counter(
+    "socratic_llm_requests_total", "LLM calls by outcome (ok, error, cache_hit)", ("call_site", "outcome"))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "socratic_http_request_seconds", "HTTP request duration until the response body completes", ("method", "route", "status"))
+
+
+# Per-request attributes (session id, topic) attached to every span opened while handling it
+_request_attributes = contextvars.ContextVar("request_attributes", default=None)
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    # Lazily created; None when tracing is disabled or OpenTelemetry isn't installed
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = False
+                if get_bool_setting("TRACING_ENABLED", False):
+                    try:
+                        from opentelemetry import trace
+                        _tracer = trace.get_tracer(get_setting("TRACING_SERVICE_NAME", "socratic-chatbot"))
+                    except ImportError:
+                        logger.warning("TRACING_ENABLED is set but opentelemetry is not installed")
+    return _tracer or None
+
+
+def begin_request() -> contextvars.Token:
+    return _request_attributes.set({})
+
+
+def end_request(token: contextvars.Token):
+    _request_attributes.reset(token)
+
+
+def annotate(**attributes):
+    # Tags the current request (and its open span) with e.g. session_id and topic
+    attributes = {name: value for name, value in attributes.items() if value is not None}
+    current = _request_attributes.get()
+    if current is not None:
+        current.update(attributes)
+    if get_tracer():
+        from opentelemetry import trace
+        trace.get_current_span().set_attributes({name: str(value) for name, value in attributes.items()})
+
+
+@contextmanager
+def span(operation: str, histogram: Histogram = OPERATION_SECONDS, **labels):
+    # Times the block into a histogram (unless None) and, when tracing is on, records it as a span
+    labels = labels or {"operation": operation}
+    tracer = get_tracer()
+    started = time.perf_counter()
+    try:
+        if tracer:
+            attributes = {name: str(value) for name, value in (_request_attributes.get() or {}).items()}
+            with tracer.start_as_current_span(operation, attributes=attributes):
+                yield
+        else:
+            yield
+    except Exception:
+        OPERATION_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        if histogram is not None:
+            histogram.observe(time.perf_counter() - started, **labels)
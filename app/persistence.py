@@ -0,0 +1,215 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import get_setting, get_int_setting, get_float_setting
+from app.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceBackpressure(Exception):
+    pass
+
+
+def session_start_update(user_email: str, category: str, topic: str, bot_intro: str, tokens: dict = None, **fields) -> dict:
+    # Every update is an upsert on session_id and only uses $set/$setOnInsert/$addToSet, so the start and
+    # the turns can reach Mongo in any order (e.g. from different workers), or more than once, and still
+    # build the same document
+    now = datetime.utcnow()
+    return {
+        "$setOnInsert": {"created_at": now},
+        "$set": {"user_email": user_email, "category": category, "topic": topic, "bot_intro": bot_intro,
+                 "start_tokens": tokens, "updated_at": now, **fields},
+    }
+
+
+def turn_update(turn: int, user_email: str, user: str, bot: str, tokens: dict = None) -> dict:
+    now = datetime.utcnow()
+    entry = {"turn": turn, "user": user, "bot": bot, "timestamp": now, "tokens": tokens}
+    return {
+        "$setOnInsert": {"created_at": now},
+        "$set": {"user_email": user_email, "updated_at": now},
+        # The entry (timestamp included) is built once, so a retry of an update the server already
+        # applied adds an identical element and $addToSet leaves the array unchanged
+        "$addToSet": {"turns": entry},
+    }
+
+
+def evaluation_update(evaluation: dict, duration: float = None, token_usage: dict = None, **fields) -> dict:
+    now = datetime.utcnow()
+    fields = {"evaluation": evaluation, "token_usage": token_usage, "evaluated_at": now, "updated_at": now, **fields}
+    if duration is not None:
+        fields["duration(seconds)"] = duration  # Callers without a timer (e.g. jobs) keep the stored one
+    return {"$setOnInsert": {"created_at": now}, "$set": fields}
+
+
+class MessageWriter:
+    # Write-behind buffer for session document updates (upserts keyed by session_id). In "sync" mode
+    # every update is written inline; in "buffered" mode they are batched into one ordered bulk_write
+    # on size or time thresholds.
+    def __init__(self, get_collection, mode: str = None, batch_size: int = None, flush_interval: float = None,
+                 max_queue: int = None, put_timeout: float = None, max_retries: int = None):
+        self.get_collection = get_collection  # Resolved lazily so importing never connects
+        self.mode = mode or get_setting("PERSISTENCE_MODE", "buffered")
+        self.batch_size = batch_size or get_int_setting("PERSISTENCE_BATCH_SIZE", 100)
+        self.flush_interval = flush_interval or get_float_setting("PERSISTENCE_FLUSH_INTERVAL", 1.0)  # Seconds
+        self.put_timeout = put_timeout or get_float_setting("PERSISTENCE_PUT_TIMEOUT", 2.0)  # Backpressure wait
+        self.max_retries = max_retries or get_int_setting("PERSISTENCE_MAX_RETRIES", 3)
+        self._queue = queue.Queue(maxsize=max_queue or get_int_setting("PERSISTENCE_MAX_QUEUE", 10000))
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    @property
+    def buffered(self) -> bool:
+        return self.mode == "buffered"
+
+    def start(self):
+        if not self.buffered or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, session_id: str, update: dict):
+        if not self.buffered or self._thread is None:
+            self._write([(session_id, update)], raise_errors=True)
+            return
+        try:
+            # Blocks the producer while the queue is full, then gives up
+            self._queue.put((session_id, update), timeout=self.put_timeout)
+        except queue.Full:
+            raise PersistenceBackpressure("Persistence queue is full")
+
+    def close(self):
+        # Stops the worker after draining everything already queued
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> list:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self._stop.is_set() and self._queue.empty()):
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _write(self, operations: list, raise_errors: bool = False):
+        started = time.perf_counter()
+        count = len(operations)
+        for attempt in range(self.max_retries):
+            try:
+                collection = self.get_collection()
+                if len(operations) == 1:
+                    session_id, update = operations[0]
+                    with span("mongo_update_one"):
+                        collection.update_one({"session_id": session_id}, update, upsert=True)
+                else:
+                    # Ordered, so a session's updates apply in the order they were submitted
+                    with span("mongo_bulk_write"):
+                        collection.bulk_write([
+                            UpdateOne({"session_id": session_id}, update, upsert=True) for session_id, update in operations
+                        ], ordered=True)
+                break
+            except Exception as e:
+                if isinstance(e, BulkWriteError) and e.details.get("writeErrors"):
+                    # Everything before the first failed update was applied; only resend the rest
+                    operations = operations[e.details["writeErrors"][0]["index"]:]
+                if raise_errors:
+                    with self._stats_lock:
+                        self._failed += len(operations)
+                    raise
+                if attempt == self.max_retries - 1:
+                    logger.exception("Dropping %d session updates after %d attempts", len(operations), self.max_retries)
+                    with self._stats_lock:
+                        self._failed += len(operations)
+                        self._written += count - len(operations)
+                    return
+                time.sleep(0.5 * 2 ** attempt)
+
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._written += count
+            self._batches += 1
+            self._last_flush_seconds = elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+            self._total_flush_seconds += elapsed
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            return {
+                "mode": self.mode,
+                "queue_depth": self._queue.qsize(),
+                "written": self._written,
+                "failed": self._failed,
+                "batches": self._batches,
+                "last_flush_seconds": self._last_flush_seconds,
+                "max_flush_seconds": self._max_flush_seconds,
+                "avg_flush_seconds": self._total_flush_seconds / self._batches if self._batches else 0.0,
+            }
+
+
+def _legacy_time(record: dict) -> datetime:
+    # Start records had no timestamp; their ObjectId carries the insert time
+    return record.get("timestamp") or record["_id"].generation_time.replace(tzinfo=None)
+
+
+def legacy_session_update(records: list) -> dict:
+    # Folds one session's records from the old per-message `api` collection (oldest first) into a session
+    # document update. Turn entries are built only from the stored records, so running it again adds nothing
+    fields, turns, evaluation = {}, [], None
+    for record in records:
+        for name in ("user_email", "category", "topic"):
+            if record.get(name) is not None:
+                fields.setdefault(name, record[name])
+        if "conversation" in record:
+            fields.setdefault("bot_intro", record["conversation"][0]["message"] if record["conversation"] else "")
+            fields.setdefault("start_tokens", record.get("tokens"))
+        elif "message" in record:
+            turns.append({"turn": len(turns) + 1, "user": record["message"]["user"], "bot": record["message"]["bot"],
+                          "timestamp": _legacy_time(record), "tokens": record.get("tokens")})
+        elif "evaluation" in record:
+            evaluation = record
+
+    on_insert = {"created_at": _legacy_time(records[0])}
+    if evaluation is not None:
+        # Only for sessions not evaluated since, which would already have a document
+        on_insert.update({"evaluation": evaluation["evaluation"], "duration(seconds)": evaluation.get("duration(seconds)"),
+                          "token_usage": evaluation.get("token_usage"), "evaluated_at": _legacy_time(evaluation)})
+    update = {"$setOnInsert": on_insert, "$max": {"updated_at": _legacy_time(records[-1])}}
+    if fields:
+        update["$set"] = fields
+    if turns:
+        update["$addToSet"] = {"turns": {"$each": turns}}
+    return update
+
+
+def ordered_turns(turns: list) -> list:
+    # Turns from different workers can be appended out of order; each carries its index
+    return sorted(turns, key=lambda turn: turn["turn"])
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from app.config import get_int_setting, get_float_setting
+
+# Lower runs first
+INTERACTIVE = 0
+START = 1
+EVALUATE = 2
+BACKGROUND = 3
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", START: "start", EVALUATE: "evaluate", BACKGROUND: "background"}
+
+
+class _Bucket:
+    # Token bucket refilled continuously up to one minute's budget; a limit of 0 disables it
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if not self.capacity:
+            return 0.0
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, tokens: int, loop=None, future=None):
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.event = threading.Event() if loop is None else None
+        self.loop = loop
+        self.future = future
+        self.cancelled = False
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif not self.future.done():
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    # Admits LLM calls in priority order within requests/min and tokens/min budgets.
+    # Sync callers block on an event, async callers await a future; one dispatcher thread serves both.
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        self._requests = _Bucket(requests_per_minute if requests_per_minute is not None else get_int_setting("LLM_REQUESTS_PER_MINUTE", 0))
+        self._tokens = _Bucket(tokens_per_minute if tokens_per_minute is not None else get_int_setting("LLM_TOKENS_PER_MINUTE", 0))
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stats = {priority: {"admitted": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0} for priority in PRIORITY_NAMES}
+        self._retries = 0
+        self._rate_limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._requests.capacity or self._tokens.capacity)
+
+    def _ensure_dispatcher(self):
+        # Caller holds the condition
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="llm-scheduler", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, priority: int, waiter: _Waiter):
+        with self._condition:
+            self._ensure_dispatcher()
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            self._condition.notify()
+
+    def _dispatch(self):
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                self._requests.refill(now)
+                self._tokens.refill(now)
+                priority, _, waiter = self._heap[0]
+                if waiter.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                delay = max(self._requests.wait_time(1), self._tokens.wait_time(waiter.tokens))
+                if delay > 0:
+                    # Strict priority: nothing jumps the head of the queue, so big evaluations can't starve chat
+                    self._condition.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+                self._requests.take(1)
+                self._tokens.take(waiter.tokens)
+                self._record_admission(priority, now - waiter.enqueued)
+                waiter.wake()
+
+    def _record_admission(self, priority: int, waited: float):
+        stats = self._stats[priority]
+        stats["admitted"] += 1
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+    def acquire(self, priority: int, tokens: int):
+        if not self.enabled:
+            return
+        waiter = _Waiter(tokens)
+        self._enqueue(priority, waiter)
+        waiter.event.wait()
+
+    async def aacquire(self, priority: int, tokens: int):
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(tokens, loop=loop, future=loop.create_future())
+        self._enqueue(priority, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            waiter.cancelled = True  # Don't spend budget on a request nobody is waiting for
+            raise
+
+    def record_retry(self, rate_limited: bool):
+        with self._condition:
+            self._retries += 1
+            if rate_limited:
+                self._rate_limited += 1
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                "requests_per_minute": self._requests.capacity,
+                "tokens_per_minute": self._tokens.capacity,
+                "queue_depth": len(self._heap),
+                "retries": self._retries,
+                "rate_limited": self._rate_limited,
+                "priorities": {
+                    PRIORITY_NAMES[priority]: {
+                        **stats,
+                        "wait_seconds_avg": stats["wait_seconds_total"] / stats["admitted"] if stats["admitted"] else 0.0
+                    }
+                    for priority, stats in self._stats.items()
+                }
+            }
+
+
+def _status_code(error: Exception):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Connection resets and timeouts from the HTTP layer
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    # Honour Retry-After when the provider sends one, otherwise jittered exponential backoff
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    base = get_float_setting("LLM_BACKOFF_BASE", 0.5)
+    cap = get_float_setting("LLM_BACKOFF_MAX", 30.0)
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+llm_scheduler = LLMScheduler()
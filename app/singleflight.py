@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from app.config import get_setting
+
+
+class SingleFlight:
+    # Coalesces concurrent identical calls: the first caller (leader) runs the call,
+    # everyone arriving while it is in flight shares its result. Sync and async callers share flights.
+    def __init__(self, sites: str = None):
+        sites = get_setting("LLM_COALESCE_SITES", "use_case") if sites is None else sites
+        self.sites = {site.strip() for site in sites.split(",") if site.strip()}
+        self._flights = {}  # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self._stats = {}  # call site -> {"leaders": n, "collapsed": n}
+        self._tasks = set()  # Strong references to async leaders' calls until they land
+
+    def enabled_for(self, call_site: str) -> bool:
+        return call_site in self.sites
+
+    def _join(self, key: str, call_site: str):
+        with self._lock:
+            stats = self._stats.setdefault(call_site, {"leaders": 0, "collapsed": 0})
+            flight = self._flights.get(key)
+            if flight is not None:
+                stats["collapsed"] += 1
+                return flight, False
+            flight = self._flights[key] = Future()
+            stats["leaders"] += 1
+            return flight, True
+
+    def _land(self, key: str, flight: Future, result=None, error: BaseException = None):
+        with self._lock:
+            self._flights.pop(key, None)
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def do(self, key: str, call_site: str, fn):
+        flight, leader = self._join(key, call_site)
+        if not leader:
+            return flight.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result=result)
+        return result
+
+    async def ado(self, key: str, call_site: str, coroutine_fn):
+        flight, leader = self._join(key, call_site)
+        if not leader:
+            # Shielded: cancelling one follower must not cancel the flight the others are waiting on
+            return await asyncio.shield(asyncio.wrap_future(flight))
+        # The call runs in its own task and lands the flight when it finishes, so a cancelled leader
+        # (e.g. a disconnected client) leaves the followers with the result instead of a CancelledError
+        task = asyncio.ensure_future(coroutine_fn())
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._land_task(key, flight, done))
+        return await asyncio.shield(task)
+
+    def _land_task(self, key: str, flight: Future, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            self._land(key, flight, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._land(key, flight, error=task.exception())
+        else:
+            self._land(key, flight, result=task.result())
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "sites": sorted(self.sites),
+                "in_flight": len(self._flights),
+                "call_sites": {site: dict(stats) for site, stats in self._stats.items()},
+            }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,187 @@
+import hashlib
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+from app.config import get_setting, get_int_setting
+
+MESSAGE_TOKEN_OVERHEAD = 4  # Role and separators added per chat message
+
+# Word/number/punctuation pre-tokenization in the style of BPE tokenizers; long words count as several pieces
+_PIECES = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _local_tokenizer():
+    # Optional exact tokenizer from a local tokenizer.json (the `tokenizers` package); never downloads
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = False
+                path = get_setting("TOKENIZER_PATH")
+                if path:
+                    from tokenizers import Tokenizer
+                    _tokenizer = Tokenizer.from_file(path)
+    return _tokenizer or None
+
+
+def _count(text: str) -> int:
+    tokenizer = _local_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    count = 0
+    for piece in _PIECES.findall(text):
+        count += 1 + (len(piece.strip()) - 1) // 6 if piece.strip() else 1
+    return count
+
+
+# Counts of long texts (system prompts, history turns re-counted on every request), keyed by a digest
+# so the cache holds 16-byte keys instead of keeping every prompt it has seen alive
+_COUNT_CACHE_SIZE = 1024
+_COUNT_CACHE_MIN_LENGTH = 256  # Shorter texts are cheaper to count than to hash
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    if len(text) < _COUNT_CACHE_MIN_LENGTH:
+        return _count(text)
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    count = _count(text)
+    with _counts_lock:
+        _counts[key] = count
+        if len(_counts) > _COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+
+def count_message_tokens(messages) -> int:
+    if isinstance(messages, str):
+        return count_tokens(messages)
+    return sum(count_tokens(message["content"]) + MESSAGE_TOKEN_OVERHEAD for message in messages)
+
+
+class TokenBudgetExceeded(Exception):
+    pass
+
+
+class TokenUsage:
+    # Per-session ledger of prompt and completion tokens, by turn and by call site, plus the caps
+    # checked before a reply is requested
+    def __init__(self, session_limit: int = None, request_limit: int = None):
+        self.session_limit = session_limit if session_limit is not None else get_int_setting("TOKEN_SESSION_LIMIT", 0)
+        self.request_limit = request_limit if request_limit is not None else get_int_setting("TOKEN_REQUEST_LIMIT", 0)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.call_sites = {}  # call_site -> {"calls", "prompt_tokens", "completion_tokens"}
+        self.turns = []  # {"turn", "prompt_tokens", "completion_tokens"} for conversation turns
+        self.background = set()  # Ids of background charges already counted
+        # Called with each background charge (summary folds, turn scores), so stores that serialize
+        # sessions can keep one that lands after the request already saved this object
+        self.on_background = None
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def record(self, call_site: str, prompt_tokens: int, completion_tokens: int, turn: int = None):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            stats = self.call_sites.setdefault(call_site, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            if turn is not None:
+                self.turns.append({"turn": turn, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+    def record_background(self, call_site: str, prompt_tokens: int, completion_tokens: int):
+        charge = {"id": uuid.uuid4().hex, "call_site": call_site,
+                  "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        self.merge_background([charge])
+        if self.on_background is not None:
+            self.on_background(charge)
+
+    def merge_background(self, charges: list):
+        # Counts each charge once, however often it is merged
+        for charge in charges:
+            with self._lock:
+                if charge["id"] in self.background:
+                    continue
+                self.background.add(charge["id"])
+            self.record(charge["call_site"], charge["prompt_tokens"], charge["completion_tokens"])
+
+    def turn(self, index: int):
+        with self._lock:
+            return next((dict(turn) for turn in reversed(self.turns) if turn["turn"] == index), None)
+
+    def allowance(self, max_tokens: int = None):
+        # Tokens the next request may use (prompt plus reserved completion), None when uncapped
+        # max_tokens is an extra cap from the caller, e.g. what is left of the user's allowance
+        limits = [] if max_tokens is None else [max_tokens]
+        if self.request_limit:
+            limits.append(self.request_limit)
+        if self.session_limit:
+            with self._lock:
+                limits.append(self.session_limit - self.total_tokens)
+        return min(limits) if limits else None
+
+    def fit(self, messages: list, rebuild, max_tokens: int = None):
+        # Checks a prompt against the caps before it is sent. With TOKEN_LIMIT_POLICY=compact an
+        # oversized prompt is rebuilt by `rebuild(budget)` with less history; otherwise it is rejected.
+        prompt_tokens = count_message_tokens(messages)
+        allowance = self.allowance(max_tokens)
+        if allowance is None:
+            return messages, prompt_tokens
+
+        reserve = get_int_setting("LLM_COMPLETION_TOKEN_ESTIMATE", 256)
+        if prompt_tokens + reserve <= allowance:
+            return messages, prompt_tokens
+        if get_setting("TOKEN_LIMIT_POLICY", "compact") == "compact" and allowance > reserve:
+            messages = rebuild(allowance - reserve)
+            prompt_tokens = count_message_tokens(messages)
+            if prompt_tokens + reserve <= allowance:
+                return messages, prompt_tokens
+        raise TokenBudgetExceeded(
+            f"Request needs about {prompt_tokens + reserve} tokens but only {max(0, allowance)} are left in the budget"
+        )
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+                "session_limit": self.session_limit or None,
+                "call_sites": {site: dict(stats) for site, stats in self.call_sites.items()},
+                "turns": [dict(turn) for turn in self.turns],
+            }
+
+    def to_state(self) -> dict:
+        with self._lock:
+            return {"token_usage": {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "call_sites": {site: dict(stats) for site, stats in self.call_sites.items()},
+                "turns": [dict(turn) for turn in self.turns],
+                "background": sorted(self.background),
+            }}
+
+    def load_state(self, state: dict):
+        usage = state.get("token_usage", {})
+        with self._lock:
+            self.prompt_tokens = usage.get("prompt_tokens", 0)
+            self.completion_tokens = usage.get("completion_tokens", 0)
+            self.call_sites = {site: dict(stats) for site, stats in usage.get("call_sites", {}).items()}
+            self.turns = [dict(turn) for turn in usage.get("turns", [])]
+            self.background = set(usage.get("background", []))
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import get_int_setting, get_float_setting
+
+# Background workers that keep the per-topic pools topped up
+_refill_executor = ThreadPoolExecutor(
+    max_workers=get_int_setting("USE_CASE_WORKERS", 4),
+    thread_name_prefix="use-case-refill"
+)
+
+
+class UseCaseCache:
+    def __init__(self, pool_size: int = None, ttl_seconds: float = None, max_topics: int = None):
+        self.pool_size = pool_size or get_int_setting("USE_CASE_POOL_SIZE", 3)  # Scenarios kept per topic
+        self.ttl_seconds = ttl_seconds or get_float_setting("USE_CASE_TTL", 3600.0)
+        self.max_topics = max_topics or get_int_setting("USE_CASE_MAX_TOPICS", 64)  # LRU bound on topics
+        self._pools = OrderedDict()  # topic -> deque of (created_at, use_case)
+        self._refilling = set()
+        self._lock = threading.Lock()
+
+    def _pool(self, topic: str) -> deque:
+        # Caller holds the lock
+        pool = self._pools.get(topic)
+        if pool is None:
+            pool = self._pools[topic] = deque()
+            while len(self._pools) > self.max_topics:
+                self._pools.popitem(last=False)
+        self._pools.move_to_end(topic)
+
+        now = time.monotonic()
+        while pool and now - pool[0][0] >= self.ttl_seconds:
+            pool.popleft()
+        return pool
+
+    def take(self, topic: str, generate):
+        # Returns a pre-generated scenario (or None on a miss) and refills the pool in the background
+        with self._lock:
+            pool = self._pool(topic)
+            use_case = pool.popleft()[1] if pool else None
+        self.refill(topic, generate)
+        return use_case
+
+    def refill(self, topic: str, generate):
+        with self._lock:
+            if topic in self._refilling:
+                return
+            self._refilling.add(topic)
+        _refill_executor.submit(self._refill, topic, generate)
+
+    def _refill(self, topic: str, generate):
+        try:
+            while True:
+                with self._lock:
+                    if len(self._pool(topic)) >= self.pool_size:
+                        return
+                use_case = generate()
+                with self._lock:
+                    self._pool(topic).append((time.monotonic(), use_case))
+        except Exception:
+            pass  # The next take() falls back to a live call and retries the refill
+        finally:
+            with self._lock:
+                self._refilling.discard(topic)
+
+    def size(self, topic: str) -> int:
+        with self._lock:
+            pool = self._pools.get(topic)
+            return len(pool) if pool else 0
+
+
+use_case_cache = UseCaseCache()
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": ordered[-1],
+    }
+
+
+def git_sha() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, results: dict) -> str:
+    # One file per benchmark and commit, so runs before and after a change can be compared
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}-{results.get('git_sha', git_sha())}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    return path
+
+
+def _flatten(value, prefix: str = "") -> dict:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(results: dict, baseline_path: str):
+    # Prints every numeric metric present in both runs with its relative change
+    with open(baseline_path) as f:
+        baseline = _flatten(json.load(f))
+    current = _flatten(results)
+    print(f"\nCompared with {baseline_path}")
+    for key in sorted(current.keys() & baseline.keys()):
+        before, after = baseline[key], current[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {key:<50} {before:>12.4f} -> {after:>12.4f}  {change}")
+
+
+def report(name: str, results: dict, save: bool = True, baseline: str = None):
+    print(json.dumps(results, indent=2, default=str))
+    if save:
+        print(f"\nSaved to {save_results(name, results)}")
+    if baseline:
+        compare(results, baseline)
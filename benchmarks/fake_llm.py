@@ -0,0 +1,150 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# OpenAI/Groq-compatible chat completions stub with configurable latency, token rate and 429 injection.
+# Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>
+
+CRITERIA = ["Clarity", "Depth", "Application", "Critical Thinking", "Progression", "Relevance", "Creativity"]
+
+SOCRATIC_REPLY = (
+    "What exactly do you mean by that, and which assumption in your answer would fail first under real-world load? "
+    "If you don't understand something, state that clearly. Otherwise, stay on topic and respond with reasoning."
+)
+
+
+class FakeLLMConfig:
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 200.0, error_rate: float = 0.0, retry_after: float = 0.1):
+        self.latency = latency  # Seconds before the first token
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate  # Fraction of requests answered with 429
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+
+def _reply_for(messages: list) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    if "/5 -" in prompt:
+        # Evaluation-style prompts expect "Criterion: [score]/5 - feedback" lines
+        return "\n".join(f"{name}: {random.randint(2, 5)}/5 - The reasoning was partially supported but lacked specifics." for name in CRITERIA)
+    return SOCRATIC_REPLY
+
+
+def _tokens(text: str) -> list:
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+
+def make_handler(config: FakeLLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real provider
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            with config.lock:
+                config.requests += 1
+                limited = random.random() < config.error_rate
+                if limited:
+                    config.rate_limited += 1
+            if limited:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                                headers={"retry-after": str(config.retry_after)})
+                return
+
+            model = body.get("model", "fake")
+            text = _reply_for(body.get("messages", []))
+            tokens = _tokens(text)
+            prompt_tokens = sum(len(m.get("content", "")) // 4 + 1 for m in body.get("messages", []))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            time.sleep(config.latency)
+
+            if not body.get("stream"):
+                time.sleep(len(tokens) / config.tokens_per_second)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data: str):
+                chunk = f"data: {data}\n\n".encode()
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            for i, token in enumerate(tokens):
+                delta = {"content": token} if i else {"role": "assistant", "content": token}
+                send(json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                }))
+                time.sleep(1 / config.tokens_per_second)
+            send(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"usage": usage}
+            }))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(config: FakeLLMConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    # Serves in a daemon thread; port 0 picks a free port (see server.server_address)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI/Groq-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(args.latency, args.tokens_per_second, args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake LLM listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import copy
+import threading
+
+from bson import ObjectId
+
+# Minimal in-process MongoDB stand-in covering the operations the app uses
+
+
+def _get(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None, False
+        value = value[part]
+    return value, True
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        value, present = _get(doc, field)
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            for op, operand in condition.items():
+                if op == "$exists" and present != bool(operand):
+                    return False
+                if op == "$gt" and not (present and value > operand):
+                    return False
+                if op == "$gte" and not (present and value >= operand):
+                    return False
+                if op == "$lt" and not (present and value < operand):
+                    return False
+                if op == "$lte" and not (present and value <= operand):
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(doc: dict, projection: dict) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    included = {field for field, flag in projection.items() if flag}
+    if included - {"_id"}:
+        result = {field: copy.deepcopy(doc[field]) for field in included if field in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {field: copy.deepcopy(value) for field, value in doc.items() if projection.get(field, 1)}
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool):
+    for op, fields in update.items():
+        for field, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                doc[field] = copy.deepcopy(value)
+            elif op == "$inc":
+                doc[field] = doc.get(field, 0) + value
+            elif op == "$addToSet":
+                array = doc.setdefault(field, [])
+                if value not in array:
+                    array.append(copy.deepcopy(value))
+            elif op == "$push":
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                array = doc.setdefault(field, [])
+                array.extend(copy.deepcopy(items))
+                if isinstance(value, dict) and "$sort" in value:
+                    for key, direction in reversed(list(value["$sort"].items())):
+                        array.sort(key=lambda item: item.get(key), reverse=direction < 0)
+
+
+class FakeResult:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeCursor:
+    def __init__(self, docs: list, projection: dict = None):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key: str, direction: int = 1):
+        self._docs.sort(key=lambda doc: _get(doc, key)[0], reverse=direction < 0)
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            docs = self._docs[:self._limit] if self._limit else self._docs
+            self._iterator = iter([_project(doc, self._projection) for doc in docs])
+        return next(self._iterator)
+
+
+class FakeCollection:
+    def __init__(self):
+        self._docs = []
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, **kwargs):
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    def insert_one(self, doc: dict):
+        with self._lock:
+            doc.setdefault("_id", ObjectId())
+            self._docs.append(copy.deepcopy(doc))
+        return FakeResult(inserted_id=doc["_id"])
+
+    def insert_many(self, docs: list, ordered: bool = True):
+        for doc in docs:
+            self.insert_one(doc)
+        return FakeResult(inserted_ids=[doc["_id"] for doc in docs])
+
+    def find(self, query: dict = None, projection: dict = None) -> FakeCursor:
+        with self._lock:
+            return FakeCursor([doc for doc in self._docs if _matches(doc, query or {})], projection)
+
+    def find_one(self, query: dict = None, projection: dict = None):
+        return next(self.find(query, projection), None)
+
+    def distinct(self, field: str, query: dict = None) -> list:
+        values = []
+        for doc in self.find(query):
+            value, present = _get(doc, field)
+            if present and value not in values:
+                values.append(value)
+        return values
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    _apply_update(doc, update, inserting=False)
+                    return FakeResult(matched_count=1, upserted_id=None)
+            if not upsert:
+                return FakeResult(matched_count=0, upserted_id=None)
+            doc = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            doc.setdefault("_id", ObjectId())
+            _apply_update(doc, update, inserting=True)
+            self._docs.append(doc)
+            return FakeResult(matched_count=0, upserted_id=doc["_id"])
+
+    def replace_one(self, query: dict, replacement: dict, upsert: bool = False):
+        with self._lock:
+            for i, doc in enumerate(self._docs):
+                if _matches(doc, query):
+                    self._docs[i] = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+                    return FakeResult(matched_count=1)
+            if upsert:
+                replacement = copy.deepcopy(replacement)
+                replacement.setdefault("_id", ObjectId())
+                self._docs.append(replacement)
+            return FakeResult(matched_count=0)
+
+    def bulk_write(self, requests: list, ordered: bool = True):
+        # Accepts pymongo UpdateOne/InsertOne request objects
+        for request in requests:
+            if type(request).__name__ == "InsertOne":
+                self.insert_one(request._doc)
+            else:
+                self.update_one(request._filter, request._doc, upsert=request._upsert)
+        return FakeResult(acknowledged=True)
+
+    def count_documents(self, query: dict) -> int:
+        with self._lock:
+            return sum(1 for doc in self._docs if _matches(doc, query))
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name: str) -> FakeCollection:
+        collection = self[name] = FakeCollection()
+        return collection
+
+
+class FakeMongoClient(dict):
+    def __missing__(self, name: str) -> FakeDatabase:
+        database = self[name] = FakeDatabase()
+        return database
+
+    def close(self):
+        pass
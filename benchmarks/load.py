@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import git_sha, percentiles, report
+from benchmarks.fake_llm import FakeLLMConfig, start_server
+from benchmarks.fake_mongo import FakeMongoClient
+
+# End-to-end load simulation of the API against a local fake LLM and an in-process fake MongoDB.
+# Run from the repository root: python -m benchmarks.load --sessions 50 --turns 5 --concurrency 10
+
+STUDENT_MESSAGES = [
+    "I think the model should be fine-tuned on the support tickets first.",
+    "The main risk is hallucination, so I would add retrieval over the product docs.",
+    "I don't understand what you mean by evaluation criteria here.",
+    "Latency matters more than accuracy for this use case because users are waiting.",
+    "We could measure success by the number of escalations avoided each week.",
+]
+
+PREDEFINED_TOPICS = [
+    ("Generative AI", "Prompt Engineering"),
+    ("Generative AI", "Retrieval-Augmented Generation (RAG)"),
+    ("Professional Development", "Effective Team Collaboration"),
+    ("LeetPrompt", "Zero-Shot Basic Conversation"),
+]
+
+
+def _configure(llm_url: str, args):
+    # Settings are read when modules are imported, so this runs before the app is imported
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ.setdefault("MODEL_NAME", "fake-model")
+    os.environ["GROQ_BASE_URL"] = llm_url
+    os.environ["USE_CASE_PREWARM"] = "true" if args.prewarm else "false"
+    os.environ.setdefault("LLM_CACHE_PATH", "")
+    os.environ.setdefault("SESSION_STORE", "memory")
+
+
+async def _timed(samples: dict, name: str, request):
+    started = time.perf_counter()
+    response = await request
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+    response.raise_for_status()
+    return response
+
+
+async def _read_stream(client, url: str, payload: dict, samples: dict, name: str) -> dict:
+    # Records time to first token as well as the full response time
+    started = time.perf_counter()
+    first_token = True
+    done = None
+    async with client.stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "token" and first_token:
+                    samples.setdefault(f"{name}_first_token", []).append(time.perf_counter() - started)
+                    first_token = False
+                elif event == "done":
+                    done = json.loads(line[len("data: "):])
+                elif event == "error":
+                    raise RuntimeError(line)
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+    return done
+
+
+async def _run_session(client, index: int, args, samples: dict):
+    category, topic = PREDEFINED_TOPICS[index % len(PREDEFINED_TOPICS)]
+    user_email = f"student{index}@example.com"
+    start = {"category": category, "topic": topic, "user_email": user_email}
+
+    if args.stream:
+        session_id = (await _read_stream(client, "/api/start_predefined_conversation/stream", start, samples, "start"))["session_id"]
+    else:
+        response = await _timed(samples, "start", client.post("/api/start_predefined_conversation", json=start))
+        session_id = response.json()["session_id"]
+
+    for _ in range(args.turns):
+        message = {"user_email": user_email, "message": random.choice(STUDENT_MESSAGES)}
+        if args.stream:
+            await _read_stream(client, f"/api/send_message/{session_id}/stream", message, samples, "send_message")
+        else:
+            await _timed(samples, "send_message", client.post(f"/api/send_message/{session_id}", json=message))
+
+    if args.evaluate:
+        await _timed(samples, "evaluate", client.post(f"/api/evaluate/{session_id}"))
+
+
+async def run(args) -> dict:
+    llm_config = FakeLLMConfig(args.latency, args.tokens_per_second, args.error_rate)
+    server = start_server(llm_config)
+    host, port = server.server_address[:2]
+    _configure(f"http://{host}:{port}", args)
+
+    import httpx
+    from app import database
+    from api.server import app
+    from api.routes import session_store, message_writer
+
+    database._client = FakeMongoClient()
+    samples = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def session(index: int):
+        nonlocal errors
+        async with semaphore:
+            try:
+                await _run_session(client, index, args, samples)
+            except Exception as e:
+                errors += 1
+                if errors <= 5:
+                    print(f"session {index} failed: {e!r}")
+
+    tracemalloc.start()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            memory_before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            await asyncio.gather(*(session(i) for i in range(args.sessions)))
+            elapsed = time.perf_counter() - started
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            store_metrics = session_store.metrics()
+            writer_metrics = message_writer.metrics()
+    tracemalloc.stop()
+    server.shutdown()
+
+    requests = sum(len(values) for name, values in samples.items() if not name.endswith("_first_token"))
+    return {
+        "git_sha": git_sha(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("save", "compare")},
+        "elapsed_seconds": elapsed,
+        "requests_per_second": requests / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "latency_seconds": {name: percentiles(values) for name, values in sorted(samples.items())},
+        "memory": {
+            "per_session_bytes": (memory_after - memory_before) / max(1, args.sessions),
+            "peak_bytes": memory_peak,
+        },
+        "fake_llm": {"requests": llm_config.requests, "rate_limited": llm_config.rate_limited},
+        "session_store": store_metrics,
+        "persistence": writer_metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-simulate the Socratic chatbot API")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="messages per session")
+    parser.add_argument("--concurrency", type=int, default=10, help="sessions in flight at once")
+    parser.add_argument("--stream", action="store_true", help="use the SSE endpoints")
+    parser.add_argument("--no-evaluate", dest="evaluate", action="store_false", help="skip the final evaluation")
+    parser.add_argument("--prewarm", action="store_true", help="prewarm the intro pools at startup")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM requests answered with 429")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="don't write benchmarks/results/")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report("load", asyncio.run(run(args)), save=args.save, baseline=args.compare)
+
+
+if __name__ == "__main__":
+    main()
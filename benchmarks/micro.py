@@ -0,0 +1,62 @@
+import argparse
+import os
+import timeit
+
+from benchmarks.common import git_sha, report
+
+# Micro-benchmarks of per-turn prompt assembly and transcript formatting, no network involved.
+# Run from the repository root: python -m benchmarks.micro --sizes 1 10 50 200
+
+REPLY = "What exactly do you mean by that, and which assumption would fail first? " * 3
+ANSWER = "I would add retrieval over the product documentation to reduce hallucinations. " * 2
+
+
+def _chatbot(turns: int, leetprompt: bool):
+    if leetprompt:
+        from app.catalog import get_catalog, LEETPROMPT_CATEGORY
+        from app.leetprompt import LeetPromptSocraticChatManager
+        topic = get_catalog().topics(LEETPROMPT_CATEGORY)[0]
+        chatbot = LeetPromptSocraticChatManager(topic=topic, category=LEETPROMPT_CATEGORY)
+    else:
+        from app.chatbot import SocraticChatManager
+        chatbot = SocraticChatManager(topic="Prompt Engineering", category="Generative AI", cache_use_case=False)
+    chatbot.history = [{"user": "", "bot": REPLY}] + [{"user": ANSWER, "bot": REPLY} for _ in range(turns)]
+    return chatbot
+
+
+def _per_call(fn, number: int, repeat: int) -> float:
+    # Best of several repeats, in microseconds per call
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def run(args) -> dict:
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ.setdefault("MODEL_NAME", "fake-model")
+    results = {"git_sha": git_sha(), "config": {"sizes": args.sizes, "number": args.number}, "microseconds": {}}
+
+    for size in args.sizes:
+        chatbot = _chatbot(size, leetprompt=False)
+        leetprompt = _chatbot(size, leetprompt=True)
+        results["microseconds"][f"turns_{size}"] = {
+            "format_chat": _per_call(lambda: chatbot._format_chat(ANSWER), args.number, args.repeat),
+            "leetprompt_format_chat": _per_call(lambda: leetprompt._format_chat(ANSWER), args.number, args.repeat),
+            "get_full_conversation": _per_call(chatbot.get_full_conversation, args.number, args.repeat),
+            "to_state": _per_call(chatbot.to_state, args.number, args.repeat),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark prompt assembly hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200], help="conversation lengths in turns")
+    parser.add_argument("--number", type=int, default=1000, help="calls per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-save", dest="save", action="store_false", help="don't write benchmarks/results/")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report("micro", run(args), save=args.save, baseline=args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,121 @@
+import logging
 import streamlit as st
-from app.chatbot import SocraticChatManager
-from app.evaluation import ConversationEvaluator
+from app.config import get_setting
 from app.login import login
-from app.database import save_conversation
 import time  # For the timer
-from app.leetprompt import LeetPromptSocraticChatManager
+import uuid
+from app.catalog import LEETPROMPT_CATEGORY
 
-from fastapi import FastAPI
-from api.routes import router as api_router
+# With API_BASE_URL set the UI is a thin client of the /api backend: sessions, LLM calls and
+# persistence all live in the API workers, and replies are streamed back over a pooled HTTP client
+REMOTE = bool(get_setting("API_BASE_URL"))
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-app.include_router(api_router, prefix="/api")
+if REMOTE:
+    from app.api_client import RemoteChatSession, ApiError, get_categories as get_api_categories
+    CHAT_ERRORS = (ApiError,)
+else:
+    from app.chatbot import SocraticChatManager, prewarm_use_cases
+    from app.evaluation import ConversationEvaluator
+    from app.database import save_conversation, save_session_update
+    from app.persistence import session_start_update, turn_update
+    from app.leetprompt import LeetPromptSocraticChatManager
+    from app.tokens import TokenBudgetExceeded
+    from app.catalog import get_catalog
+    CHAT_ERRORS = (TokenBudgetExceeded,)
+
+
+@st.cache_resource
+def prewarm_intro_pools(topics: tuple):
+    # Runs once per Streamlit process; pools are refilled in the background afterwards
+    prewarm_use_cases(topics)
+
+
+@st.cache_data(ttl=60)
+def load_api_categories() -> dict:
+    return get_api_categories()
+
+
+def new_chatbot(category: str, topic: str):
+    # For Critical Thinking, we handle it a bit differently
+    if REMOTE:
+        if category == "Critical Thinking":
+            return RemoteChatSession(st.session_state.user["username"], topic="Critical Thinking", custom=True)
+        return RemoteChatSession(st.session_state.user["username"], topic=topic, category=category)
+    if category == "Critical Thinking":
+        return SocraticChatManager(topic="Critical Thinking", category=category)
+    if category == LEETPROMPT_CATEGORY:
+        return LeetPromptSocraticChatManager(category=category, topic=topic)
+    return SocraticChatManager(topic=topic)
+
+
+def render_turn(turn: dict):
+    if turn["user"]:
+        with st.chat_message("user"):
+            st.markdown(turn["user"])
+    with st.chat_message("assistant"):
+        st.markdown(turn["bot"])
+
+
+def save_update(update: dict):
+    # The reply has already been shown, so a database problem is logged rather than ending the script
+    try:
+        save_session_update(st.session_state.session_id, update)
+    except Exception:
+        logger.warning("Saving conversation %s failed", st.session_state.session_id, exc_info=True)
+
+
+def record_start(chatbot, category: str, topic: str):
+    # Local mode only: the API records its own sessions
+    if not REMOTE:
+        save_update(session_start_update(
+            st.session_state.user["username"], category, topic, chatbot.get_conversation_turns()[0]["bot"],
+            tokens=chatbot.usage.turn(0), user_id=st.session_state.user
+        ))
+
+
+def record_turn(chatbot):
+    # Appends just the new turn to the conversation's document
+    if not REMOTE:
+        turns = chatbot.get_conversation_turns()
+        save_update(turn_update(
+            len(turns) - 1, st.session_state.user["username"], turns[-1]["user"], turns[-1]["bot"],
+            tokens=chatbot.usage.turn(len(turns) - 1)
+        ))
+
+
+def tokens_used(chatbot) -> int:
+    return chatbot.total_tokens if REMOTE else chatbot.usage.total_tokens
+
+
+@st.fragment
+def conversation():
+    # A message reruns only this fragment instead of the whole page. Every run still re-emits the past
+    # turns (Streamlit rebuilds a fragment's elements each time), but nothing above it is recomputed.
+    # Fragments can't write to the sidebar, so the timer and token count live here
+    status_slot = st.empty()  # Filled after this run's turn, so it never lags a turn behind
+
+    for turn in st.session_state.chatbot.get_conversation_turns():
+        render_turn(turn)
+
+    # chat_input clears itself and triggers exactly one fragment run per message
+    user_input = st.chat_input("Your response")
+    if user_input and user_input.strip():
+        # Only the new turn is rendered here, streaming the reply token by token
+        with st.chat_message("user"):
+            st.markdown(user_input)
+        with st.chat_message("assistant"):
+            try:
+                st.write_stream(st.session_state.chatbot.stream_user_reply(user_input))
+                record_turn(st.session_state.chatbot)
+            except CHAT_ERRORS as e:
+                st.error(str(e))
+
+    elapsed_time = time.time() - st.session_state.start_time
+    status_slot.markdown(
+        f"**Time Elapsed:** {elapsed_time:.2f} seconds · **Tokens Used:** {tokens_used(st.session_state.chatbot)}"
+    )
 
 
 # 1. Check if the user is logged in
@@ -29,46 +133,21 @@ else:
     st.set_page_config(page_title="EchoDeepak: Socratic Approach", layout="centered")
     st.title("EchoDeepak: Socratic Approach")
 
-    # Categories and Topics (including Critical Thinking)
-    categories = {
-        "Generative AI": [
-            "Prompt Engineering",
-            "Few-shot / One-shot / Chain-of-Thought",
-            "LangChain / LlamaIndex",
-            "Retrieval-Augmented Generation (RAG)",
-            "Hallucinations in LLMs",
-            "Responsible AI",
-            "Agents and Automation",
-            "GenAI Use Cases",
-            "Ethics and Risks"
-        ],
-        "Professional Development": [
-            "Positive Attitude at Work",
-            "Professionalism in the Workplace",
-            "Time Management & Meeting Deadlines",
-            "Effective Team Collaboration",
-            "Handling Feedback and Talking to Seniors",
-            "Behavior and Communication in a Company",
-            "Owning and Contributing to Projects"
-        ],
-        "Critical Thinking": [
-            "Data Abstraction",
-            "Model Testing",
-            "Data Cleaning",
-            "Validation",
-            "Data Transformation",
-            "Model Deployment",
-            "Data Integration",
-            "Feature Engineering"
-        ],
-        "LeetPrompt": [
-            "Zero-Shot Basic Conversation",
-            "One-Shot Simple Query",
-            "Few-Shot Greeting Variations",
-            "Zero-Shot Open Ended Question",
-            "One-Shot Fact-Based Query",
-        ]
-    }
+    # Categories and Topics (including Critical Thinking), shared with the API
+    if REMOTE:
+        try:
+            categories = load_api_categories()
+        except ApiError as e:
+            st.error(str(e))
+            st.stop()
+    else:
+        categories = get_catalog().categories
+
+        # Critical Thinking sessions all use the category itself as the topic
+        prewarm_intro_pools(tuple(
+            [topic for category, topics in categories.items() if category not in (LEETPROMPT_CATEGORY, "Critical Thinking") for topic in topics]
+            + ["Critical Thinking"]
+        ))
 
     # 3. Session state initialization
     if "chatbot" not in st.session_state:
@@ -81,6 +160,8 @@ else:
         st.session_state.evaluation_result = None
     if "conversation_saved" not in st.session_state:
         st.session_state.conversation_saved = False
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = None  # Key of the conversation's MongoDB document
     if "start_time" not in st.session_state:
         st.session_state.start_time = None  # To store the start time
     if "end_time" not in st.session_state:
@@ -94,16 +175,19 @@ else:
 
     # 6. Start conversation
     if st.button("Start Conversation"):
-        # For Critical Thinking, we handle it a bit differently
-        if selected_category == "Critical Thinking":
-            st.session_state.chatbot = SocraticChatManager(topic="Critical Thinking", category=selected_category)
-        elif selected_category == "LeetPrompt":
-            st.session_state.chatbot = LeetPromptSocraticChatManager(category=selected_category, topic=selected_topic)
-        else:
-            st.session_state.chatbot = SocraticChatManager(topic=selected_topic)
-
+        st.session_state.chatbot = new_chatbot(selected_category, selected_topic)
+
+        # Stream the intro into a placeholder; the history loop below renders it once complete
+        intro_placeholder = st.empty()
+        try:
+            st.session_state.bot_intro = intro_placeholder.write_stream(st.session_state.chatbot.stream_bot_start())
+        except CHAT_ERRORS as e:
+            st.error(str(e))
+            st.stop()
+        intro_placeholder.empty()
         st.session_state.conversation_active = True
-        st.session_state.bot_intro = st.session_state.chatbot.bot_start()
+        st.session_state.session_id = str(uuid.uuid4())
+        record_start(st.session_state.chatbot, selected_category, selected_topic)
         st.session_state.evaluation_result = None
         st.session_state.conversation_saved = False
 
@@ -112,97 +196,46 @@ else:
 
     # 7. Conversation flow
     if st.session_state.conversation_active:
-        # Calculate elapsed time
-        elapsed_time = time.time() - st.session_state.start_time
-
-        # Display the timer in the sidebar so it stays visible
-        with st.sidebar:
-            st.markdown(f"**Time Elapsed:** {elapsed_time:.2f} seconds")
-
         st.markdown("### Conversation")
-
-        # Show previous turns
-        for turn in st.session_state.chatbot.get_conversation_turns():
-            if turn['user']:
-                st.markdown(f"**You:** {turn['user']}")
-            st.markdown("---")
-            st.markdown(f"**EchoDeepak:** {turn['bot']}")
-
-        # Display text input field
-        user_input = st.text_area("Your response:", key="user_input", height=100)
-
-        # Display 'Next' button for conversation progression
-        if st.button("Next") and user_input.strip():
-            bot_reply = st.session_state.chatbot.user_reply(user_input)
-
-            # Display current turn immediately
-            st.markdown(f"**You:** {user_input}")
-            st.markdown("---")
-            st.markdown(f"**EchoDeepak:** {bot_reply}")
-
-            # Clear input manually
-            del st.session_state["user_input"]
-            st.rerun()
+        conversation()
 
     # 8. Evaluation Button
     if st.session_state.conversation_active and len(st.session_state.chatbot.get_conversation_turns()) > 0:
-        if st.button("Evaluate my responses"):
-            if not st.session_state.evaluation_result:
-                evaluator = ConversationEvaluator()
-                convo_text = st.session_state.chatbot.get_full_conversation()
-                st.session_state.evaluation_result = evaluator.evaluate(convo_text)
-
-                # End the timer when evaluation is clicked
-                st.session_state.end_time = time.time()
-
-                # Calculate the duration
-                elapsed_time = st.session_state.end_time - st.session_state.start_time
-                st.session_state.duration = elapsed_time  # Store the duration
-
-                # Save the conversation along with the time to MongoDB
-                conversation_data = {
-                    "turns": st.session_state.chatbot.get_conversation_turns(),
-                    "topic": selected_topic,
-                    "category": selected_category,
-                    "evaluation": st.session_state.evaluation_result,
-                    "duration": st.session_state.duration  # Add duration here
-                }
-
-                save_conversation(
-                    user_id=st.session_state.user,
-                    selected_topic=selected_topic,
-                    selected_category=selected_category,
-                    evaluation_result=st.session_state.evaluation_result,
-                    duration=st.session_state.duration  # Pass duration to MongoDB
-                )
-
-                st.rerun()
+        if st.button("Evaluate my responses") and not st.session_state.evaluation_result:
+            # End the timer when evaluation is clicked
+            st.session_state.end_time = time.time()
+            st.session_state.duration = st.session_state.end_time - st.session_state.start_time  # Store the duration
+
+            with st.spinner("Evaluating your responses..."):
+                try:
+                    if REMOTE:
+                        # The API evaluates and stores the conversation together with its duration
+                        st.session_state.evaluation_result = st.session_state.chatbot.evaluate(st.session_state.duration)
+                        st.session_state.conversation_saved = True
+                    else:
+                        evaluator = ConversationEvaluator()
+                        st.session_state.evaluation_result = evaluator.evaluate_chat(st.session_state.chatbot)
+                except CHAT_ERRORS as e:
+                    st.error(str(e))
 
     # 9. Evaluation Display
     if st.session_state.evaluation_result:
         st.markdown("### Evaluation Summary")
-        st.markdown(st.session_state.evaluation_result)
+        st.markdown(st.session_state.evaluation_result["text"])
 
         # Display the duration of the conversation after evaluation
         st.markdown("### Time Taken")
         st.markdown(f"**Time Taken:** {st.session_state.duration:.2f} seconds")
 
         if not st.session_state.conversation_saved:
-            conversation_data = {
-                "turns": st.session_state.chatbot.get_conversation_turns(),
-                "topic": selected_topic,
-                "category": selected_category,
-                "evaluation": st.session_state.evaluation_result,
-                "duration": st.session_state.duration  # Store duration
-            }
-
-            # Update save_conversation call to include duration
+            # Sets the evaluation on the conversation's document, so a repeat save is harmless
             save_conversation(
                 user_id=st.session_state.user,
                 selected_topic=selected_topic,
                 selected_category=selected_category,
                 evaluation_result=st.session_state.evaluation_result,
-                duration=st.session_state.duration  # Store duration in DB
+                duration=st.session_state.duration,  # Store duration in DB
+                session_id=st.session_state.session_id
             )
 
             st.session_state.conversation_saved = True
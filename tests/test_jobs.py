@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from api.jobs import EvaluationJobQueue, InMemoryJobStore, RUNNING, SUCCEEDED
+
+
+class LeasedJobStore(InMemoryJobStore):
+    # Claims that expire like RedisJobStore's SET NX EX keys
+    def __init__(self):
+        super().__init__()
+        self.claims = {}
+
+    def claim(self, job_id: str, lease: float) -> bool:
+        now = time.monotonic()
+        if self.claims.get(job_id, 0) > now:
+            return False
+        self.claims[job_id] = now + lease
+        return True
+
+    def release(self, job_id: str):
+        self.claims.pop(job_id, None)
+
+
+def test_job_with_stale_claim_runs_after_the_lease_expires():
+    async def scenario():
+        store = LeasedJobStore()
+        # A worker crashed while running j1 and left its claim behind
+        store.put({"job_id": "j1", "session_id": "s1", "priority": 10, "status": RUNNING, "attempts": 1,
+                   "result": None, "error": None, "created_at": "", "updated_at": ""})
+        store.claim("j1", 0.2)
+
+        async def handler(job):
+            return {"text": "ok"}
+
+        queue = EvaluationJobQueue(handler, store=store, workers=1, lease=0.2, claim_retry=0.05)
+        await queue.start()
+        try:
+            for _ in range(100):
+                if store.get("j1")["status"] == SUCCEEDED:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await queue.stop()
+        return store.get("j1")
+
+    job = asyncio.run(scenario())
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == {"text": "ok"}
+    assert job["attempts"] == 2